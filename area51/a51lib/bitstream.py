@@ -1,96 +1,108 @@
 import struct
 
+# How many bytes are converted to an int at a time. Reads come from this window until they run past its end.
+WINDOW_BYTES = 64
+
+_FLOAT = struct.Struct('>f')
+_U32 = struct.Struct('>I')
+
 class Bitstream:
+    """ Reads values written most significant bit first, as the level bin property data is.
+
+        Rather than going byte by byte, a window of the data is held as an int and reads
+        shift and mask it.
+    """
+
     def __init__(self, data, bitpos=0):
         self.data = data
         self.bitpos = bitpos
-            
-    def _read_raw(self, num_bits) -> int:
-        leftOffset = self.bitpos & 7
-        rightOffset = (40 - leftOffset - num_bits)
-    
+        self._window = 0
+        self._window_start = 0
+        self._window_end = 0
+
+    def _fill_window(self, num_bits):
         byte_pos = self.bitpos >> 3
-        end_pos = ((self.bitpos + num_bits - 1) >> 3) + 1
+        num_bytes = max(WINDOW_BYTES, ((self.bitpos & 7) + num_bits + 7) >> 3)
+        chunk = self.data[byte_pos:byte_pos + num_bytes]
+        self._window = int.from_bytes(chunk, 'big')
+        self._window_start = byte_pos * 8
+        self._window_end = self._window_start + len(chunk) * 8
+        if self.bitpos + num_bits > self._window_end:
+            raise EOFError(f'Bitstream read of {num_bits} bits at bit {self.bitpos} runs past the end of the data')
 
+    def _read_raw(self, num_bits) -> int:
+        if self.bitpos < self._window_start or self.bitpos + num_bits > self._window_end:
+            self._fill_window(num_bits)
+        shift = self._window_end - self.bitpos - num_bits
         self.bitpos += num_bits
-        readMask = (0xFFFFFFFFFF >> leftOffset) & (0xFFFFFFFFFF << rightOffset)
-        dataMask = 0
-
-        shift = 32
-        while byte_pos != end_pos:
-            b = struct.unpack_from('B', self.data, byte_pos)[0]
-            byte_pos += 1
-            dataMask |= (b << shift)
-            shift -= 8
-
-        return (dataMask & readMask) >> rightOffset
+        return (self._window >> shift) & ((1 << num_bits) - 1)
 
     def _read_raw_bits(self, num_bits) -> bytearray:
-        byte_array = bytearray()
-        bits_left = num_bits
-        bit_buffer = 0
-        bits_in_buffer = 0
-        byte_offset = self.bitpos >> 3
+        """ Read bits for a string, which are packed differently to everything else.
+
+            The bits left in the current byte are taken from the bottom of the byte rather than the
+            top, then whole bytes follow and a final partial byte is again taken from the bottom.
+            The pieces are joined least significant first. So 0x5c 0x52 read from bit 6 gives 0x48,
+            i.e. the 'H' which the game data has there, and not the 0x14 which reading from the top
+            would give.
+        """
         bit_offset = self.bitpos & 7
+        byte_pos = self.bitpos >> 3
+        num_bytes = (bit_offset + num_bits + 7) >> 3
+        chunk = self.data[byte_pos:byte_pos + num_bytes]
+        if len(chunk) < num_bytes:
+            raise EOFError(f'Bitstream read of {num_bits} bits at bit {self.bitpos} runs past the end of the data')
+        value = int.from_bytes(chunk, 'little')
+        first_bits = 8 - bit_offset
+        value = (value & ((1 << first_bits) - 1)) | ((value >> 8) << first_bits)
+        value &= (1 << num_bits) - 1
 
-        while bits_left > 0:
-            bits_to_read = min(bits_left, 8 - bit_offset)
-            b = struct.unpack_from('B', self.data, byte_offset)[0]
-            bit_buffer |= (b & (~(-1 << bits_to_read))) << bits_in_buffer
-            bits_in_buffer += bits_to_read
-            byte_offset += 1
-            bit_offset = 0
-            while bits_in_buffer >= 8:
-                byte_array.append(bit_buffer & 0xFF)
-                bit_buffer >>= 8
-                bits_in_buffer -= 8
-            bits_left -= bits_to_read
-        if bits_in_buffer > 0:
-            byte_array.append(bit_buffer & 0xFF)
+        self.bitpos += num_bits
+        return bytearray(value.to_bytes((num_bits + 7) >> 3, 'little'))
 
+    def skip(self, num_bits):
         self.bitpos += num_bits
-        return byte_array
+
+    def skip_string(self):
+        """ Skip a string written as read_string reads it. """
+        string_len = self._read_raw(8)
+        self.bitpos += string_len * 8
 
     def read_float(self) -> float:
-        raw = self._read_raw(32)
-        buf = struct.pack('I', raw)
-        return struct.unpack('f', buf)[0]
-    
+        return _FLOAT.unpack(_U32.pack(self._read_raw(32)))[0]
+
+    def read_u32(self) -> int:
+        return self._read_raw(32)
+
     def read_s32(self) -> int:
-        self.bitpos += 32
-        return 0
-    
+        value = self._read_raw(32)
+        return value - (1 << 32) if value & 0x80000000 else value
+
     def read_u64(self) -> int:
-        self.bitpos += 64
-        return 0
-    
+        return self._read_raw(64)
+
     def read_bool(self) -> int:
         return self._read_raw(1) == 1
-        
+
     def read_v2(self) -> list[float]:
         return [self.read_float(), self.read_float()]
-    
+
     def read_v3(self) -> list[float]:
          return [self.read_float(), self.read_float(), self.read_float()]
 
     def read_bounding_box(self) -> list[float]:
-        self.bitpos += 6 * 32
-        return [0, 0, 0, 0, 0, 0]
-    
+        """ min x, y, z then max x, y, z """
+        return [self.read_float() for _ in range(6)]
+
     def read_colour(self) -> int:
-        self.bitpos += 32
-        return 0
-    
+        """ The colour as a 32 bit int, first byte read in the top 8 bits. """
+        return self._read_raw(32)
+
     def read_string(self) -> str:
+        """ A length byte, which counts the terminating 0, then the characters. """
         string_len = self._read_raw(8)
-        s = ''
-        # This is wrong. The way the buffer has to be read is complex and bizarre.
-        # a sequence 0x5c 0x52 starting at bit offset 6 will return 0x48 and not 0x14
-        # as you may expect.
         buf = self._read_raw_bits(string_len * 8)
-        for i in range(string_len-1):
-            c = buf[i]
-            s += chr(c)
-            string_len -= 1
-        
-        return s
\ No newline at end of file
+        end = buf.find(0)
+        if end >= 0:
+            buf = buf[:end]
+        return buf.decode('latin-1')
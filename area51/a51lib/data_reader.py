@@ -1,4 +1,39 @@
 import struct
+import sys
+
+def find_nul(data, offset: int = 0) -> int:
+    """ The offset of the first 0 byte at or after offset, or -1 if there isn't one. """
+    if hasattr(data, 'find'):
+        return data.find(b'\0', offset)
+    # memoryviews have no find, so search copies of small but growing pieces rather than the whole view
+    chunk_size = 64
+    start = offset
+    while start < len(data):
+        end = bytes(data[start:start + chunk_size]).find(b'\0')
+        if end >= 0:
+            return start + end
+        start += chunk_size
+        chunk_size *= 2
+    return -1
+
+def read_c_string(data, offset: int = 0) -> tuple[str, int]:
+    """ Read the 0 terminated string at offset, returning it and the offset after the terminator.
+        A string without a terminator runs to the end of the data.
+    """
+    end = find_nul(data, offset)
+    if end < 0:
+        end = len(data)
+    return bytes(data[offset:end]).decode('latin-1'), end + 1
+
+def split_c_strings(data) -> list[str]:
+    """ Split a block of 0 terminated strings, such as a level dictionary, into interned strings. """
+    data = bytes(data)
+    if not data:
+        return []
+    strings = data.split(b'\0')
+    if data.endswith(b'\0'):
+        strings.pop()
+    return [sys.intern(string.decode('latin-1')) for string in strings]
 
 class DataReader:
     """ Code to deal with reading binary data. """
@@ -91,11 +126,5 @@ class DataReader:
         return struct.unpack_from(f'{count}B', self.data, start)
     
     def read_string(self) -> str:
-        output = ''
-        while self.has_data() and self.data[self.cursor] != 0:
-            output += chr(self.data[self.cursor])
-            self.cursor += 1
-        # step over null terminator
-        self.cursor += 1
+        output, self.cursor = read_c_string(self.data, self.cursor)
         return output
-    
\ No newline at end of file
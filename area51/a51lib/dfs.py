@@ -1,26 +1,61 @@
+from bisect import bisect_left
+from fnmatch import fnmatchcase
 from io import BufferedReader
+import mmap
 import struct
 
+from .data_reader import read_c_string
+from .lru_cache import LRUCache
+
 def read_string(file, string_data):
     string_offset = struct.unpack('I', file.read(4))[0]
-    output = ''
-    while string_data[string_offset] != 0:
-        output += chr(string_data[string_offset])
-        string_offset += 1
-    return output
+    return read_c_string(string_data, string_offset)[0]
 
 
 class Dfs:
     """ A class to deal with DFS files """
 
     is_valid = False
+    use_mmap = False
+    _keep_open = False
+    _parts: LRUCache = None
+    file_entries: list[dict]
+    # casefolded full name -> file entry
+    entries_by_name: dict[str, dict]
+    # casefolded extension -> full names, in archive order
+    names_by_ext: dict[str, list[str]]
+    # casefolded full names, sorted for prefix queries
+    sorted_names: list[str]
+
+    def open(self, base_filename: str, use_mmap: bool = False, max_open_parts: int = 8):
+        """ filename does not include the extension.
 
-    def open(self, base_filename: str):
-        """ filename does not include the extension """
+            With use_mmap each data file is memory mapped once and get_file returns
+            memoryview slices of it instead of copying each sub-file.
+            At most max_open_parts data files (.000, .001, ...) are kept open at a time.
+            Call close (or use the Dfs as a context manager) to release them.
+        """
         self.base_filename = base_filename
+        self.use_mmap = use_mmap
+        self._keep_open = self._keep_open or use_mmap
+        self._parts = LRUCache(max_open_parts, on_evict=self._close_part)
         with open(base_filename+'.DFS', 'rb') as dfsFile:
             self.read_header(dfsFile)
 
+    def close(self):
+        """ Release all open data file handles and mappings. """
+        if self._parts is not None:
+            self._parts.clear()
+        self._keep_open = False
+
+    def __enter__(self) -> 'Dfs':
+        # keep the data files open until the with block ends
+        self._keep_open = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def read_header(self, dfs_file: BufferedReader):
         identifier = dfs_file.read(4).decode('utf-8')
         if identifier != 'SFDX':
@@ -55,33 +90,116 @@ class Dfs:
             entry['ext_name'] = read_string(dfs_file, string_data)
             entry['data_offset'] = struct.unpack('I', dfs_file.read(4))[0]
             entry['data_length'] = struct.unpack('I', dfs_file.read(4))[0]
+            entry['name'] = entry['file_name1'] + entry['file_name2'] + entry['ext_name']
             self.file_entries.append(entry)
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """ Build the name and extension lookup tables from file_entries. """
+        self.entries_by_name = {}
+        self.names_by_ext = {}
+        for entry in self.file_entries:
+            key = entry['name'].casefold()
+            # keep the first entry if a name is duplicated, same as the old linear scan
+            self.entries_by_name.setdefault(key, entry)
+            self.names_by_ext.setdefault(entry['ext_name'].casefold(), []).append(entry['name'])
+        self.sorted_names = sorted(self.entries_by_name)
 
     def list_files(self):
         for entry in self.file_entries:
-            name = entry['file_name1'] + \
-                entry['file_name2'] + entry['ext_name']
+            name = entry['name']
             print(
                 f"{name:<48} start:{entry['data_offset']:>8},  length:{entry['data_length']:>8}")
 
+    def get_entry(self, sub_filename: str) -> dict | None:
+        """ Get the file entry for a sub-file, ignoring case. """
+        return self.entries_by_name.get(sub_filename.casefold())
+
     def get_filenames(self, extension: str) -> list[str]:
         """ Get a list of filenames with the given extension """
-        target_ext = extension.casefold()
+        return list(self.names_by_ext.get(extension.casefold(), []))
+
+    def get_filenames_with_prefix(self, prefix: str) -> list[str]:
+        """ Get a list of filenames starting with prefix, ignoring case. """
+        target = prefix.casefold()
         filenames = []
-        for entry in self.file_entries:
-            entry_ext = entry['ext_name'].casefold()
-            if entry_ext == target_ext:
-                name = entry['file_name1'] + entry['file_name2'] + entry['ext_name']
-                filenames.append(name)
+        idx = bisect_left(self.sorted_names, target)
+        while idx < len(self.sorted_names) and self.sorted_names[idx].startswith(target):
+            filenames.append(self.entries_by_name[self.sorted_names[idx]]['name'])
+            idx += 1
         return filenames
 
-    def get_file(self, sub_filename: str) -> bytes | None:
-        """ Get the data for a sub-file. Assumes that there is only one data file """
-        target = sub_filename.casefold()
-        for entry in self.file_entries:
-            entry_name = (entry['file_name1'] + entry['file_name2'] + entry['ext_name']).casefold()
-            if target == entry_name:
-                with open(self.base_filename+'.000', 'rb') as data_file:
-                    data_file.seek(entry['data_offset'])
-                    return data_file.read(entry['data_length'])
-        return None
+    def glob(self, pattern: str) -> list[str]:
+        """ Get a list of filenames matching a shell style pattern (*, ?, [seq]), ignoring case. """
+        target = pattern.casefold()
+        # Only names sharing the literal prefix of the pattern can match.
+        wildcard_pos = min((pos for pos in (target.find(c) for c in '*?[') if pos >= 0), default=len(target))
+        candidates = self.get_filenames_with_prefix(target[:wildcard_pos])
+        return [name for name in candidates if fnmatchcase(name.casefold(), target)]
+
+    def get_file(self, sub_filename: str) -> bytes | memoryview | None:
+        """ Get the data for a sub-file.
+            Returns a memoryview into the mapped data file when opened with use_mmap,
+            unless the sub-file spans two data files.
+        """
+        entry = self.get_entry(sub_filename)
+        if entry is None:
+            return None
+        return self.read_data(entry['data_offset'], entry['data_length'])
+
+    def part_filename(self, part: int) -> str:
+        """ The name of a data file. The data is split over .000, .001 etc. every split_size bytes. """
+        return f'{self.base_filename}.{part:03d}'
+
+    def read_data(self, offset: int, length: int) -> bytes | memoryview:
+        """ Read length bytes at a data offset, crossing data files as needed. """
+        chunks = []
+        while True:
+            if self.split_size > 0:
+                part, part_offset = divmod(offset, self.split_size)
+                chunk_length = min(length, self.split_size - part_offset)
+            else:
+                part, part_offset = 0, offset
+                chunk_length = length
+            chunks.append(self._read_part(part, part_offset, chunk_length))
+            offset += chunk_length
+            length -= chunk_length
+            if length <= 0:
+                break
+        if len(chunks) == 1:
+            return chunks[0]
+        return b''.join(chunks)
+
+    def _read_part(self, part: int, offset: int, length: int) -> bytes | memoryview:
+        if self.use_mmap:
+            if length == 0:
+                return memoryview(b'')
+            return memoryview(self._get_part(part))[offset:offset+length]
+        if self._keep_open:
+            data_file = self._get_part(part)
+            data_file.seek(offset)
+            return data_file.read(length)
+        with open(self.part_filename(part), 'rb') as data_file:
+            data_file.seek(offset)
+            return data_file.read(length)
+
+    def _get_part(self, part: int) -> BufferedReader | mmap.mmap:
+        """ Get the open handle, or mapping, of a data file from the pool. """
+        handle = self._parts.get(part)
+        if handle is None:
+            handle = open(self.part_filename(part), 'rb')
+            if self.use_mmap:
+                # the mapping keeps its own descriptor, so the file itself can be closed
+                with handle:
+                    handle = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parts.put(part, handle)
+        return handle
+
+    @staticmethod
+    def _close_part(part: int, handle: BufferedReader | mmap.mmap):
+        try:
+            handle.close()
+        except BufferError:
+            # memoryviews returned by get_file are still alive.
+            # The mapping is released when the last of them goes away.
+            pass
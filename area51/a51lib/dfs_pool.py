@@ -0,0 +1,25 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .dfs import Dfs
+
+# The Dfs opened by the current worker process
+_worker_dfs: Dfs = None
+
+def _init_worker(base_filename: str):
+    global _worker_dfs
+    _worker_dfs = Dfs()
+    _worker_dfs.open(base_filename, use_mmap=True)
+
+def worker_dfs() -> Dfs:
+    """ The Dfs opened by this worker process. Only valid inside a dfs_process_pool task. """
+    return _worker_dfs
+
+def dfs_process_pool(dfs: Dfs, workers: int) -> ProcessPoolExecutor:
+    """
+    A process pool whose workers each open and map the same DFS as dfs.
+    Tasks only need to be sent data offsets and lengths, which they read with worker_dfs().read_data.
+    Workers are spawned on every platform rather than forked, so they don't inherit Blender or its threads.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker, initargs=(dfs.base_filename,))
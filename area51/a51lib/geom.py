@@ -1,5 +1,6 @@
+from .data_reader import read_c_string
 
-from .inev_file import InevFile
+from .inev_file import InevFile, InevDiagnostic
 
 class Material:
     detail_scale: float
@@ -50,10 +51,12 @@ class Geom:
     materials: list[Material]
     meshes: list[Mesh]
     sub_meshes: list[SubMesh]
-    string_data: bytearray
+    string_data: bytes
+    diagnostics: list[InevDiagnostic]
 
     def __init__(self):
         self.valid = False
+        self.diagnostics = []
         self.bounding_box = [0.0] * 6
         self.textures = []
         self.meshes = []
@@ -68,6 +71,8 @@ class Geom:
         self.read_inev(inev_file)
 
     def read_inev(self, inev_file: InevFile):
+        # shared with the InevFile so that problems found by derived geoms are kept too
+        self.diagnostics = inev_file.diagnostics
         self.bounding_box = inev_file.read_bounding_box()
         self.platform = inev_file.read_i16()
         inev_file.skip(2)
@@ -130,7 +135,8 @@ class Geom:
         # inevFile.readNativeArray(stringData, stringDataSize);
         array_cursor = inev_file.resolve_pointer(self.string_data_size)
         inev_file.push_cursor(array_cursor)
-        self.string_data = inev_file.read_byte_array(self.string_data_size)
+        # copy the (small) string table so lookups work when bin_data is a memoryview
+        self.string_data = bytes(inev_file.read_byte_array(self.string_data_size))
         inev_file.pop_cursor()
 
         inev_file.skip(4) # Read the unused handle
@@ -206,10 +212,7 @@ class Geom:
         """ Lookup a string in the string data. """
         if offset < 0 or offset >= len(self.string_data):
             return ''
-        end = self.string_data.find(0, offset)
-        if end == -1:
-            end = len(self.string_data)
-        return self.string_data[offset:end].decode('utf-8')
+        return read_c_string(self.string_data, offset)[0]
 
     def is_valid(self):
         return self.valid
@@ -218,4 +221,6 @@ class Geom:
         if not self.valid:
             print("Geom is not valid")
             return
+        for diagnostic in self.diagnostics:
+            print(f'Warning at 0x{diagnostic.source:x}: {diagnostic.message}')
         print(f'Bounding Box: [{self.bounding_box[0]:.1f}, {self.bounding_box[1]:.1f}, {self.bounding_box[2]:.1f}] -> [{self.bounding_box[4]:.1f}, {self.bounding_box[5]:.1f}, {self.bounding_box[5]:.1f}]')
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .dfs import Dfs
+from .geom import Geom, Material, Mesh, SubMesh, Texture
+from .inev_file import InevDiagnostic
+from .rigid_geom import RigidDlist, RigidGeom, RIGID_VERTEX_DTYPE
+
+# Bump whenever parsing changes, so that cached geoms are parsed again.
+PARSER_VERSION = 2
+
+class GeomCache:
+    """
+    A directory of parsed rigid geoms, so that later runs can skip INEV parsing.
+
+    Each geom is stored as three files named by a hash of the DFS path, the entry's offset and length
+    and PARSER_VERSION:
+    <key>.vertices.npy holds the vertices of every dlist, one after another,
+    <key>.indices.npy holds the indices of every dlist, one after another,
+    <key>.json holds everything else and where each dlist's vertices and indices start.
+    The arrays are read into memory when loaded, rather than memory mapped, so that a cached geom
+    doesn't keep its files open, and the dlists are views of them.
+    """
+
+    cache_dir: str
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, dfs: Dfs, geom_name: str) -> str | None:
+        entry = dfs.get_entry(geom_name)
+        if entry is None:
+            return None
+        source = f"{os.path.abspath(dfs.base_filename)}|{entry['data_offset']}|{entry['data_length']}|{PARSER_VERSION}"
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def load(self, dfs: Dfs, geom_name: str) -> RigidGeom | None:
+        """ The cached geom, or None if it isn't cached. """
+        key = self.key(dfs, geom_name)
+        if key is None:
+            return None
+        try:
+            # the json is written last, so if it exists the arrays do too
+            with open(self._path(key, '.json'), 'r') as json_file:
+                info = json.load(json_file)
+            vertices = np.load(self._path(key, '.vertices.npy'))
+            indices = np.load(self._path(key, '.indices.npy'))
+        except (OSError, ValueError):
+            return None
+        return _rigid_geom_from_cache(info, vertices, indices)
+
+    def store(self, dfs: Dfs, geom_name: str, geom: RigidGeom):
+        key = self.key(dfs, geom_name)
+        if key is None:
+            return
+        info, vertices, indices = _rigid_geom_to_cache(geom)
+        np.save(self._path(key, '.vertices.npy'), vertices)
+        np.save(self._path(key, '.indices.npy'), indices)
+        json_filename = self._path(key, '.json')
+        with open(json_filename + '.tmp', 'w') as json_file:
+            json.dump(info, json_file)
+        os.replace(json_filename + '.tmp', json_filename)
+
+
+def _to_dict(obj) -> dict:
+    return {name: list(value) if isinstance(value, tuple) else value for name, value in vars(obj).items()}
+
+def _from_dict(cls, values: dict):
+    obj = cls()
+    obj.__dict__.update(values)
+    return obj
+
+def _rigid_geom_to_cache(geom: RigidGeom) -> tuple[dict, np.ndarray, np.ndarray]:
+    geom_info = {}
+    for name, value in vars(geom.geom).items():
+        if name in ('textures', 'materials', 'meshes', 'sub_meshes'):
+            value = [_to_dict(item) for item in value]
+        elif name == 'string_data':
+            value = value.hex()
+        elif name == 'diagnostics':
+            value = [[diagnostic.source, diagnostic.message] for diagnostic in value]
+        elif isinstance(value, tuple):
+            value = list(value)
+        geom_info[name] = value
+
+    dlists = []
+    vertex_start = 0
+    index_start = 0
+    for dlist in geom.dlists:
+        dlists.append([vertex_start, len(dlist.vertex_data), index_start, len(dlist.indices), dlist.bone_index])
+        vertex_start += len(dlist.vertex_data)
+        index_start += len(dlist.indices)
+
+    vertices = np.concatenate([dlist.vertex_data for dlist in geom.dlists] + [np.zeros(0, dtype=RIGID_VERTEX_DTYPE)])
+    indices = np.concatenate([dlist.indices for dlist in geom.dlists] + [np.zeros(0, dtype='<u2')])
+    info = {
+        'parser_version': PARSER_VERSION,
+        'geom': geom_info,
+        'num_dlist': geom.num_dlist,
+        'dlists': dlists,
+    }
+    return info, vertices, indices
+
+def _rigid_geom_from_cache(info: dict, vertices: np.ndarray, indices: np.ndarray) -> RigidGeom:
+    geom = Geom()
+    for name, value in info['geom'].items():
+        if name == 'textures':
+            value = [_from_dict(Texture, item) for item in value]
+        elif name == 'materials':
+            value = [_from_dict(Material, item) for item in value]
+        elif name == 'meshes':
+            value = [_from_dict(Mesh, item) for item in value]
+        elif name == 'sub_meshes':
+            value = [_from_dict(SubMesh, item) for item in value]
+        elif name == 'string_data':
+            value = bytes.fromhex(value)
+        elif name == 'diagnostics':
+            value = [InevDiagnostic(source, message) for source, message in value]
+        setattr(geom, name, value)
+
+    rigid_geom = RigidGeom()
+    rigid_geom.geom = geom
+    rigid_geom.valid = True
+    rigid_geom.num_dlist = info['num_dlist']
+    for vertex_start, num_vertices, index_start, num_indices, bone_index in info['dlists']:
+        dlist = RigidDlist()
+        dlist.vertex_data = vertices[vertex_start:vertex_start + num_vertices]
+        dlist.indices = indices[index_start:index_start + num_indices]
+        dlist.bone_index = bone_index
+        rigid_geom.dlists.append(dlist)
+    return rigid_geom
@@ -1,19 +1,40 @@
 import struct
 
+import numpy as np
+
 class Ref:
     offset: int
     count: int
     pointing_at: int
     flags: int
 
+class InevDiagnostic:
+    """ A problem found while resolving a pointer. """
+    source: int
+    message: str
+
+    def __init__(self, source: int, message: str):
+        # offset of the pointer within the static data
+        self.source = source
+        self.message = message
+
+    def __repr__(self):
+        return f"InevDiagnostic(0x{self.source:x}, {self.message!r})"
+
 class InevFile:
     """ Code to deal with reading an INEV file. """
 
-    refs: list[type[Ref]]
+    refs: list[Ref]
+    # pointer offset within the static data -> Ref
+    ref_map: dict[int, Ref]
+    diagnostics: list[InevDiagnostic]
 
     def __init__(self, data):
         self.data = data
         self.cursor_stack = []
+        self.refs = []
+        self.ref_map = {}
+        self.diagnostics = []
         (self.sig,
         self.version,
         self.num_static_bytes,
@@ -26,36 +47,51 @@ class InevFile:
             self.dynamic_data_offset = self.static_data_offset + self.num_static_bytes
             self.resolve_table_offset = self.static_data_offset + self.num_static_bytes - self.num_tables * 16
             idx = self.resolve_table_offset
-            self.refs = []
             for _ in range(self.num_tables):
                 ref = Ref()
                 (ref.offset, ref.count, ref.pointing_at, ref.flags) = struct.unpack_from("<iiiI", data, idx)
                 idx += 16
                 self.refs.append(ref)
-
+                self.ref_map.setdefault(ref.offset, ref)
+
+    def _ref_target(self, ref: Ref) -> int:
+        """ The absolute offset a ref points at, or -1 if its flags are not supported. """
+        if ref.flags == 3:
+            # points to static data
+            return ref.pointing_at + self.static_data_offset
+        if ref.flags == 1:
+            # points to dynamic data
+            return ref.pointing_at + self.dynamic_data_offset
+        return -1
 
     def resolve_pointer(self, expected_count):
         resolved_offset = -1
         source = self.cursor - self.static_data_offset
-        for ref in self.refs:
-            if ref.offset == source:
-                if ref.flags == 3:
-                    # points to static data
-                    resolved_offset = ref.pointing_at + self.static_data_offset
-                    if ref.count != expected_count:
-                        print(f'Warning, expected count to be {expected_count}, but saw {ref.count}')
-                elif ref.flags == 1:
-                    # points to dynamic data
-                    resolved_offset = ref.pointing_at + self.static_data_offset + self.num_static_bytes
-                    if ref.count != expected_count:
-                        print(f'Warning, expected count to be {expected_count}, but saw {ref.count}')
-                else:
-                    print('Flag not supported')
-                break
+        ref = self.ref_map.get(source)
+        if ref is not None:
+            resolved_offset = self._ref_target(ref)
+            if resolved_offset < 0:
+                self.diagnostics.append(InevDiagnostic(source, f'Flag {ref.flags} not supported'))
+            elif ref.count != expected_count:
+                self.diagnostics.append(InevDiagnostic(
+                    source, f'Expected count to be {expected_count}, but saw {ref.count}'))
 
         self.cursor += 4
         return resolved_offset
 
+    def resolve_all(self) -> dict[int, int]:
+        """ Resolve every pointer in one pass.
+            Maps each pointer's offset within the static data to the absolute offset it points at.
+        """
+        targets = {}
+        for source, ref in self.ref_map.items():
+            target = self._ref_target(ref)
+            if target < 0:
+                self.diagnostics.append(InevDiagnostic(source, f'Flag {ref.flags} not supported'))
+            else:
+                targets[source] = target
+        return targets
+
     def push_cursor(self, new_cursor):
         self.cursor_stack.append(self.cursor)
         self.cursor = new_cursor
@@ -127,4 +163,13 @@ class InevFile:
         start = self.cursor
         self.cursor += count
         return struct.unpack_from(f'{count}B', self.data, start)
-    
\ No newline at end of file
+    
+
+    def read_array(self, dtype, count) -> np.ndarray:
+        """ Reads an array of count items of a numpy dtype. The array is a view of the data, not a copy. """
+        dtype = np.dtype(dtype)
+        if count <= 0:
+            return np.zeros(0, dtype=dtype)
+        start = self.cursor
+        self.cursor += dtype.itemsize * count
+        return np.frombuffer(self.data, dtype=dtype, count=count, offset=start)
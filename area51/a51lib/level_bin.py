@@ -1,4 +1,6 @@
-from .data_reader import DataReader
+import numpy as np
+
+from .data_reader import DataReader, split_c_strings
 from .bitstream import Bitstream
 from enum import IntEnum
 
@@ -10,7 +12,24 @@ class LevelObject:
     guid: int
     # read from the dictionary via the type_index
     type_name: str
-    properties: dict
+    # where the object's property values start in the bitstream
+    bit_offset: int
+
+    def __init__(self, level_bin: 'LevelBin' = None):
+        self._level_bin = level_bin
+        self._properties = None
+        self.bit_offset = 0
+
+    @property
+    def properties(self) -> dict:
+        """ The property values, decoded from the bitstream the first time they're asked for. """
+        if self._properties is None:
+            self._properties = self._level_bin.decode_properties(self) if self._level_bin is not None else {}
+        return self._properties
+
+    @properties.setter
+    def properties(self, properties: dict):
+        self._properties = properties
 
 
 class LevelProperty:
@@ -36,11 +55,49 @@ class PropertyType(IntEnum):
     EXTERNAL = 14
     FILENAME = 15
 
+# Bits used by each fixed size property type. The string types are a length byte then the characters.
+PROPERTY_BITS = {
+    PropertyType.FLOAT: 32,
+    PropertyType.INT: 32,
+    PropertyType.BOOL: 1,
+    PropertyType.VECTOR2: 64,
+    PropertyType.VECTOR3: 96,
+    PropertyType.ROTATION: 96,
+    PropertyType.ANGLE: 32,
+    PropertyType.BBOX: 192,
+    PropertyType.GUID: 64,
+    PropertyType.COLOR: 32,
+}
+STRING_PROPERTY_TYPES = {PropertyType.STRING, PropertyType.ENUM, PropertyType.BUTTON, PropertyType.EXTERNAL, PropertyType.FILENAME}
+
+# The fixed size object and property headers which come before the bitstream.
+OBJECT_DTYPE = np.dtype([
+    ('type_index', '<i2'),
+    ('num_properties', '<i2'),
+    ('start_property_idx', '<i4'),
+    ('guid', '<u8'),
+])
+PROPERTY_DTYPE = np.dtype([
+    ('type_index', '<u2'),
+    ('name_index', '<u2'),
+])
+
 class LevelBin:
+    """ The objects of a level and their properties.
+
+        The object and property headers are kept as arrays (object_table and property_table).
+        LevelObjects are made as they are asked for, and their properties are decoded when first used.
+    """
 
-    objects: list[LevelObject]
-    properties: list[LevelProperty]
     dictionary: list[str]
+    object_table: np.ndarray
+    property_table: np.ndarray
+    # bitstream position of each object's first property value
+    object_bit_offsets: np.ndarray
+    # object indices, by type name and by guid
+    type_indices: dict[str, np.ndarray]
+    guid_indices: dict[int, int]
+    bitstream: Bitstream
 
     def init(self, bin_data, dict_data):
         """ Initialise the object by decoding the serialised bin_data. """
@@ -55,38 +112,87 @@ class LevelBin:
         self._read_objects(reader)
         self._read_properties(reader)
 
-        bitstream = Bitstream(bin_data, reader.cursor * 8)
-        self._init_objects_from_bitstream(bitstream)
+        self.bitstream = Bitstream(bin_data, reader.cursor * 8)
+        self._find_object_bit_offsets(self.bitstream)
 
     def _init_dictionary(self, dict_data):
-        self.dictionary = []
-        reader = DataReader(dict_data)
-        while reader.has_data():
-            self.dictionary.append(reader.read_string())
-
-    def _init_objects_from_bitstream(self, bitstream: Bitstream):
-        object_type_names = set()
-        for obj in self.objects:
-            object_type_names.add(obj.type_name)
-            obj.properties = {}
-            start_idx = obj.start_property_idx
-            end_idx = start_idx + obj.num_properties
-
-            verbose = False
-            # uncomment any types you want to log the properties of
-            #
-            # Invisible Wall objects are windows
-            #verbose |= obj.type_name == 'Invisible Wall'
-            #verbose |= obj.type_name == 'Anim Surface'
-            #verbose |= obj.type_name == 'Door'
-
-            for prop_idx in range(start_idx, end_idx):
-                prop = self.properties[prop_idx]
-                self._add_prop(obj.properties, prop, bitstream, verbose)
-        print("Found the following object types\n" + str(object_type_names))
-
-    def _add_prop(self, properties: dict, prop: LevelProperty, bitstream: Bitstream, verbose: bool):
-        clean_type = prop.type_index & 0xFF
+        self.dictionary = split_c_strings(dict_data)
+
+    def object(self, obj_idx: int) -> LevelObject:
+        if self._objects[obj_idx] is None:
+            record = self.object_table[obj_idx]
+            obj = LevelObject(self)
+            obj.type_index = int(record['type_index'])
+            obj.type_name = self.dictionary[obj.type_index]
+            obj.num_properties = int(record['num_properties'])
+            obj.start_property_idx = int(record['start_property_idx'])
+            obj.guid = int(record['guid'])
+            obj.bit_offset = int(self.object_bit_offsets[obj_idx])
+            self._objects[obj_idx] = obj
+        return self._objects[obj_idx]
+
+    @property
+    def objects(self) -> list[LevelObject]:
+        """ Every LevelObject, made the first time they're all asked for. """
+        if self._all_objects is None:
+            self._all_objects = [self.object(obj_idx) for obj_idx in range(self.num_objects)]
+        return self._all_objects
+
+    @property
+    def properties(self) -> list[LevelProperty]:
+        """ LevelProperty objects for property_table, made the first time they're asked for. """
+        if self._properties is None:
+            self._properties = []
+            for type_index, name_index in self.property_table.tolist():
+                prop = LevelProperty()
+                prop.type_index = type_index
+                prop.name_index = name_index
+                prop.name = self.dictionary[name_index]
+                self._properties.append(prop)
+        return self._properties
+
+    def objects_of_type(self, type_name: str) -> list[LevelObject]:
+        return [self.object(obj_idx) for obj_idx in self.type_indices.get(type_name, ())]
+
+    def object_by_guid(self, guid: int) -> LevelObject | None:
+        obj_idx = self.guid_indices.get(guid)
+        return self.object(obj_idx) if obj_idx is not None else None
+
+    def _find_object_bit_offsets(self, bitstream: Bitstream):
+        """ Step over the property values, noting where each object's values start, without decoding them. """
+        self.object_bit_offsets = np.zeros(self.num_objects, dtype=np.int64)
+        prop_types = (self.property_table['type_index'] & 0xFF).tolist()
+        starts = self.object_table['start_property_idx'].tolist()
+        counts = self.object_table['num_properties'].tolist()
+        for obj_idx in range(self.num_objects):
+            self.object_bit_offsets[obj_idx] = bitstream.bitpos
+            for prop_idx in range(starts[obj_idx], starts[obj_idx] + counts[obj_idx]):
+                clean_type = prop_types[prop_idx]
+                if clean_type in PROPERTY_BITS:
+                    bitstream.skip(PROPERTY_BITS[clean_type])
+                elif clean_type in STRING_PROPERTY_TYPES:
+                    bitstream.skip_string()
+                else:
+                    raise RuntimeError("Uknown property type: " + str(clean_type))
+
+    def decode_properties(self, obj: LevelObject, verbose: bool = False) -> dict:
+        # uncomment any types you want to log the properties of
+        #
+        # Invisible Wall objects are windows
+        #verbose |= obj.type_name == 'Invisible Wall'
+        #verbose |= obj.type_name == 'Anim Surface'
+        #verbose |= obj.type_name == 'Door'
+
+        properties = {}
+        # a cursor of its own, so decoding doesn't move self.bitstream
+        bitstream = Bitstream(self.bitstream.data, obj.bit_offset)
+        prop_range = slice(obj.start_property_idx, obj.start_property_idx + obj.num_properties)
+        for type_index, name_index in self.property_table[prop_range].tolist():
+            self._add_prop(properties, type_index, self.dictionary[name_index], bitstream, verbose)
+        return properties
+
+    def _add_prop(self, properties: dict, type_index: int, name: str, bitstream: Bitstream, verbose: bool):
+        clean_type = type_index & 0xFF
         pval =0
         match clean_type:
             case PropertyType.FLOAT:
@@ -121,27 +227,24 @@ class LevelBin:
                 pval = bitstream.read_string()
             case _:
                 raise RuntimeError("Uknown property type: " + str(clean_type))
-        properties[prop.name] = pval
+        properties[name] = pval
         if verbose:
-            print(prop.name + ' = ' + str(pval))
+            print(name + ' = ' + str(pval))
 
 
     def _read_objects(self, reader: DataReader):
-        self.objects = []
-        for _ in range(0, self.num_objects):
-            obj = LevelObject()
-            obj.type_index = reader.read_i16()
-            obj.type_name = self.dictionary[obj.type_index]
-            obj.num_properties = reader.read_i16()
-            obj.start_property_idx = reader.read_int()
-            obj.guid = reader.read_u64()
-            self.objects.append(obj)
+        self.object_table = np.frombuffer(reader.data, dtype=OBJECT_DTYPE, count=self.num_objects, offset=reader.cursor)
+        reader.skip(OBJECT_DTYPE.itemsize * self.num_objects)
+        self._objects = [None] * self.num_objects
+        self._all_objects = None
+
+        # group the object indices by type, keeping them in order within each type
+        type_indices, inverse, counts = np.unique(self.object_table['type_index'], return_inverse=True, return_counts=True)
+        groups = np.split(np.argsort(inverse, kind='stable'), np.cumsum(counts)[:-1])
+        self.type_indices = {self.dictionary[type_index]: group for type_index, group in zip(type_indices.tolist(), groups)}
+        self.guid_indices = {guid: obj_idx for obj_idx, guid in enumerate(self.object_table['guid'].tolist())}
 
     def _read_properties(self, reader: DataReader):
-        self.properties = []
-        for _ in range(0, self.num_properties):
-            prop = LevelProperty()
-            prop.type_index = reader.read_u16()
-            prop.name_index = reader.read_u16()
-            prop.name = self.dictionary[prop.name_index]
-            self.properties.append(prop)
+        self.property_table = np.frombuffer(reader.data, dtype=PROPERTY_DTYPE, count=self.num_properties, offset=reader.cursor)
+        reader.skip(PROPERTY_DTYPE.itemsize * self.num_properties)
+        self._properties = None
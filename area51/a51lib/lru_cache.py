@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class LRUCache:
+    """ A least recently used cache bounded by the total size of its values.
+
+        By default every value has a size of 1, so max_size is a count.
+        on_evict is called with (key, value) whenever a value leaves the cache.
+    """
+
+    max_size: int
+    total_size: int
+
+    def __init__(self, max_size: int, size_of: Callable[[Any], int] = None,
+                 on_evict: Callable[[Any, Any], None] = None):
+        self.max_size = max_size
+        self.total_size = 0
+        self._size_of = size_of if size_of is not None else (lambda value: 1)
+        self._on_evict = on_evict
+        self._entries = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """ Get a value, marking it as the most recently used. """
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key, value):
+        """ Add or replace a value, then evict the least recently used values until within max_size.
+            The newest value is never evicted, even if it is larger than max_size on its own.
+        """
+        if key in self._entries:
+            self.pop(key)
+        size = self._size_of(value)
+        self._entries[key] = (value, size)
+        self.total_size += size
+        while self.total_size > self.max_size and len(self._entries) > 1:
+            old_key = next(iter(self._entries))
+            self.pop(old_key)
+
+    def pop(self, key):
+        """ Remove a value, calling on_evict for it. """
+        value, size = self._entries.pop(key)
+        self.total_size -= size
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+        return value
+
+    def clear(self):
+        """ Remove every value, calling on_evict for each. """
+        while self._entries:
+            self.pop(next(iter(self._entries)))
@@ -1,13 +1,43 @@
 import struct
 
+import numpy as np
+
+from .data_reader import read_c_string
 from .vecmath import BoundingBox
 
-def read_z_string(data, offset):
-    output = ''
-    while data[offset] != 0:
-        output += chr(data[offset])
-        offset += 1
-    return output
+# One surface record in a zone's surface array, 128 bytes.
+SURFACE_DTYPE = np.dtype([
+    ('l2w', '<f4', (16,)),          # 4x4 matrix, column major
+    ('bbox', '<f4', (8,)),          # min x, y, z, w then max x, y, z, w
+    ('attr_bits', '<u4'),
+    ('colour_index', '<u4'),
+    ('pad', 'V16'),
+    ('zone_1', 'u1'),
+    ('zone_2', 'u1'),
+    ('geom_index', '<u2'),
+    ('render_flags', '<u4'),
+])
+
+SPATIAL_HASH_SIZE = 1021
+
+# The spatial database's hash buckets, each the start and length of a chain of cells.
+SPATIAL_HASH_DTYPE = np.dtype([
+    ('first_cell', '<i4'),          # -1 for an empty bucket
+    ('num_cells', '<i4'),
+])
+
+# A cell_size cube of the spatial database, 24 bytes. Its surfaces are a range of the surfaces
+# of every zone then every portal, numbered in file order.
+SPATIAL_CELL_DTYPE = np.dtype([
+    ('x', '<i2'),
+    ('y', '<i2'),
+    ('z', '<i2'),
+    ('pad', 'V2'),
+    ('next', '<i4'),                # next cell in the same bucket, -1 at the end
+    ('first_surface', '<i4'),
+    ('num_surfaces', '<i4'),
+    ('pad2', 'V4'),
+])
 
 class Surface:
     def __init__(self):
@@ -16,15 +46,92 @@ class Surface:
         self.attr_bits = 0
         self.colour_index = 0
         self.geom_name = ''
+        self.geom_index = 0
         self.render_flags = 0
         self.zone_1 = 0
         self.zone_2 = 0
 
 class ZoneInfo:
-    surfaces: list[Surface]
-    def __init__(self):
-        self.surfaces = []
+    """ The surfaces of a zone, held as columns of a SURFACE_DTYPE array.
+        Surface objects are only made if the surfaces property is used.
+    """
+    records: np.ndarray
+    geoms: list[str]
+    # the spatial database's number for the first surface
+    first_surface: int
+
+    def __init__(self, records: np.ndarray = None, geoms: list[str] = None, first_surface: int = 0):
+        self.records = records if records is not None else np.zeros(0, dtype=SURFACE_DTYPE)
+        self.geoms = geoms if geoms is not None else []
+        self.first_surface = first_surface
         self.colours = []
+        self._surfaces = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def l2w(self) -> np.ndarray:
+        """ (N, 16) local to world matrices, column major. """
+        return self.records['l2w']
+
+    @property
+    def bboxes(self) -> np.ndarray:
+        """ (N, 8) bounding boxes, as stored. """
+        return self.records['bbox']
+
+    @property
+    def attr_bits(self) -> np.ndarray:
+        return self.records['attr_bits']
+
+    @property
+    def colour_index(self) -> np.ndarray:
+        return self.records['colour_index']
+
+    @property
+    def zone_1(self) -> np.ndarray:
+        return self.records['zone_1']
+
+    @property
+    def zone_2(self) -> np.ndarray:
+        return self.records['zone_2']
+
+    @property
+    def geom_index(self) -> np.ndarray:
+        return self.records['geom_index']
+
+    @property
+    def render_flags(self) -> np.ndarray:
+        return self.records['render_flags']
+
+    def geom_name(self, surf_no: int) -> str:
+        geom_index = int(self.records['geom_index'][surf_no])
+        return self.geoms[geom_index] if geom_index < len(self.geoms) else ''
+
+    def geom_names(self, surf_nos: np.ndarray = None) -> list[str]:
+        """ The distinct geoms used by the zone, or by just the surfaces surf_nos of it. """
+        geom_index = self.geom_index if surf_nos is None else self.geom_index[surf_nos]
+        return [self.geoms[i] for i in np.unique(geom_index) if i < len(self.geoms)]
+
+    def surface(self, surf_no: int) -> Surface:
+        record = self.records[surf_no]
+        surface = Surface()
+        surface.l2w = tuple(record['l2w'].tolist())
+        surface.bounding_box = BoundingBox(record['bbox'].tolist())
+        surface.attr_bits = int(record['attr_bits'])
+        surface.colour_index = int(record['colour_index'])
+        surface.zone_1 = int(record['zone_1'])
+        surface.zone_2 = int(record['zone_2'])
+        surface.geom_index = int(record['geom_index'])
+        surface.geom_name = self.geom_name(surf_no)
+        surface.render_flags = int(record['render_flags'])
+        return surface
+
+    @property
+    def surfaces(self) -> list[Surface]:
+        if self._surfaces is None:
+            self._surfaces = [self.surface(surf_no) for surf_no in range(len(self.records))]
+        return self._surfaces
 
 class Playsurface:
     
@@ -35,6 +142,11 @@ class Playsurface:
     geoms: list[str]
     zones: list[ZoneInfo]
     portals: list[ZoneInfo]
+    # the game's spatial database
+    cell_size: int
+    num_spatial_surfaces: int
+    spatial_hash: np.ndarray
+    spatial_cells: np.ndarray
 
     def init(self, bin_data):
         ints = struct.unpack_from('IIII', bin_data)
@@ -44,60 +156,45 @@ class Playsurface:
         self.num_geoms = ints[3]
         
         index = self.readSpatialDB(bin_data, 16)
+        self._num_surfaces_read = 0
         self.geoms = []
         for _ in range(self.num_geoms):
-            self.geoms.append(read_z_string(bin_data, index))
+            self.geoms.append(read_c_string(bin_data, index)[0])
             index += 128
 
         self.zones = []
         for _ in range(self.num_zones):
             (index, zone) = self.read_zone_info(bin_data, index)
-            if len(zone.surfaces) > 0:
+            if len(zone) > 0:
                 self.zones.append(zone)
 
         self.portals = []
         for _ in range(self.num_portals):
             (index, portal) = self.read_zone_info(bin_data, index)
-            if len(portal.surfaces) > 0:
+            if len(portal) > 0:
                 self.portals.append(portal)
 
     def read_zone_info(self, bin_data, offset):
-        zone = ZoneInfo()
         file_offset = struct.unpack_from('I', bin_data, offset+4)[0]
         num_surfaces = struct.unpack_from('I', bin_data, offset+8)[0]
         num_colours = struct.unpack_from('I', bin_data, offset+16)[0]
         offset += 28
 
-        zone_info_offset = file_offset
-        for _ in range(num_surfaces):
-            surface = Surface()
-            surface.l2w = struct.unpack_from('16f', bin_data, zone_info_offset)
-            zone_info_offset += 64  # 4x4 matrix is 16 floats, each float is 4 bytes)
-            surface.bounding_box = BoundingBox(struct.unpack_from('8f', bin_data, zone_info_offset))
-            zone_info_offset += 32
-            surface.attr_bits = struct.unpack_from('I', bin_data, zone_info_offset)[0]
-            zone_info_offset += 4
-            surface.colour_index = struct.unpack_from('I', bin_data, zone_info_offset)[0]
-            zone_info_offset += 4
-            zone_info_offset += 4*4
-            surface.zone_1 = struct.unpack_from('B', bin_data, zone_info_offset)[0]
-            surface.zone_2 = struct.unpack_from('B', bin_data, zone_info_offset + 1)[0]
-            geom_indx = struct.unpack_from('H', bin_data, zone_info_offset + 2)[0]
-            surface.geom_name = self.geoms[geom_indx] if geom_indx < len(self.geoms) else ''
-            zone_info_offset += 4
-            surface.render_flags = struct.unpack_from('I', bin_data, zone_info_offset)[0]
-            zone_info_offset += 4
-            zone.surfaces.append(surface)
-
-        return offset, zone
+        first_surface = self._num_surfaces_read
+        self._num_surfaces_read += num_surfaces
+        if num_surfaces == 0:
+            # the offset of an empty zone may be past the end of the data
+            return offset, ZoneInfo(np.zeros(0, dtype=SURFACE_DTYPE), self.geoms, first_surface)
+        records = np.frombuffer(bin_data, dtype=SURFACE_DTYPE, count=num_surfaces, offset=file_offset)
+        return offset, ZoneInfo(records, self.geoms, first_surface)
 
     def readSpatialDB(self, bin_data, offset):
-        # cell_size = struct.unpack_from('I', bin_data, offset)[0]
-        num_cells = struct.unpack_from('I', bin_data, offset+4)[0]
-        # num_surfaces = struct.unpack_from('I', bin_data, offset+8)[0]
+        self.cell_size, num_cells, self.num_spatial_surfaces = struct.unpack_from('III', bin_data, offset)
         offset += 12
-        offset += 8 * 1021  # Skip hash table
-        offset += num_cells * 24    # Skip cell data
+        self.spatial_hash = np.frombuffer(bin_data, dtype=SPATIAL_HASH_DTYPE, count=SPATIAL_HASH_SIZE, offset=offset)
+        offset += SPATIAL_HASH_DTYPE.itemsize * SPATIAL_HASH_SIZE
+        self.spatial_cells = np.frombuffer(bin_data, dtype=SPATIAL_CELL_DTYPE, count=num_cells, offset=offset)
+        offset += SPATIAL_CELL_DTYPE.itemsize * num_cells
         return offset
 
     def describe(self):
@@ -105,4 +202,6 @@ class Playsurface:
         print(f'NumZones:    {self.num_zones}')
         print(f'Num Portals: {self.num_portals}')
         print(f'Num Geoms:   {self.num_geoms}')
+        print(f'Cell Size:   {self.cell_size}')
+        print(f'Num Cells:   {len(self.spatial_cells)}')
         
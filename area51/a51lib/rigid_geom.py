@@ -1,6 +1,16 @@
+import numpy as np
+
 from .inev_file import InevFile
 from .geom import Geom
 
+# Layout of a PC rigid vertex
+RIGID_VERTEX_DTYPE = np.dtype([
+    ('position', '<f4', 3),
+    ('normal', '<f4', 3),
+    ('colour', 'u1', 4),
+    ('uv', '<f4', 2),
+])
+
 class RigidVertex:
     position: list[float]
     normal: list[float]
@@ -14,14 +24,56 @@ class RigidVertex:
         self.uv = [0.0, 0.0]
 
 class RigidDlist:
-    indices: list[int]
-    vertices: list[RigidVertex]
+    indices: np.ndarray
+    vertex_data: np.ndarray
     bone_index: int
 
     def __init__(self):
-        self.indices = []
-        self.vertices = []
+        self.indices = np.zeros(0, dtype='<u2')
+        self.vertex_data = np.zeros(0, dtype=RIGID_VERTEX_DTYPE)
         self.bone_index = -1
+        self._vertices = None
+
+    def __getstate__(self):
+        # don't pickle the per vertex objects, they can be rebuilt from the arrays
+        state = self.__dict__.copy()
+        state['_vertices'] = None
+        return state
+
+    @property
+    def positions(self) -> np.ndarray:
+        """ (N, 3) float array of vertex positions. """
+        return self.vertex_data['position']
+
+    @property
+    def normals(self) -> np.ndarray:
+        """ (N, 3) float array of vertex normals. """
+        return self.vertex_data['normal']
+
+    @property
+    def colours(self) -> np.ndarray:
+        """ (N, 4) uint8 array of vertex colours. """
+        return self.vertex_data['colour']
+
+    @property
+    def uvs(self) -> np.ndarray:
+        """ (N, 2) float array of vertex uvs. """
+        return self.vertex_data['uv']
+
+    @property
+    def vertices(self) -> list[RigidVertex]:
+        """ The vertices as RigidVertex objects. Built on first use, prefer the arrays. """
+        if self._vertices is None:
+            self._vertices = []
+            for position, normal, colour, uv in zip(self.positions.tolist(), self.normals.tolist(),
+                                                    self.colours.tolist(), self.uvs.tolist()):
+                vertex = RigidVertex()
+                vertex.position = position
+                vertex.normal = normal
+                vertex.colour = colour
+                vertex.uv = uv
+                self._vertices.append(vertex)
+        return self._vertices
 
 class RigidGeom:
 
@@ -39,6 +91,10 @@ class RigidGeom:
     def is_valid(self):
         return self.valid and self.geom != None and self.geom.is_valid()
 
+    def data_size(self) -> int:
+        """ The number of bytes in the dlist arrays, which is most of a geom's memory. """
+        return sum(dlist.vertex_data.nbytes + dlist.indices.nbytes for dlist in self.dlists)
+
     def read(self, bin_data):
         inev_file = InevFile(bin_data)
         self.valid = inev_file.is_valid()
@@ -72,20 +128,13 @@ class RigidGeom:
             num_indices = inev_file.read_u32()
             indices_cursor = inev_file.resolve_pointer(num_indices)
             inev_file.push_cursor(indices_cursor)
-            for _ in range(num_indices):
-                dl.indices.append(inev_file.read_u16())
+            dl.indices = inev_file.read_array('<u2', num_indices)
             inev_file.pop_cursor()
 
             num_vertices = inev_file.read_int()
             vertices_cursor = inev_file.resolve_pointer(num_vertices)
             inev_file.push_cursor(vertices_cursor)
-            for _ in range(num_vertices):
-                vertex = RigidVertex()
-                vertex.position = inev_file.read_float_array(3)
-                vertex.normal = inev_file.read_float_array(3)
-                vertex.colour = inev_file.read_uint8_array(4)
-                vertex.uv = inev_file.read_float_array(2)
-                dl.vertices.append(vertex)
+            dl.vertex_data = inev_file.read_array(RIGID_VERTEX_DTYPE, num_vertices)
             inev_file.pop_cursor()
 
             dl.bone_index = inev_file.read_int()
@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .dfs import Dfs
+from .dfs_pool import dfs_process_pool, worker_dfs
+from .geom_cache import GeomCache
+from .rigid_geom import RigidGeom
+
+def read_rigid_geom(geom_name: str, geom_data) -> RigidGeom | None:
+    """ Parse a rigid geom, returning None (and saying why) if it can't be. """
+    if geom_data is None:
+        print(f'Failed to find data for {geom_name}')
+        return None
+    geom = RigidGeom()
+    geom.read(geom_data)
+    if not geom.is_valid():
+        print(f'Failed to read {geom_name}')
+        return None
+    return geom
+
+def _read_rigid_geom_worker(geom_name: str, offset: int, length: int) -> RigidGeom | None:
+    """ Runs in a worker process. The parsed geom is array backed, so it is cheap to send back. """
+    return read_rigid_geom(geom_name, worker_dfs().read_data(offset, length))
+
+def load_rigid_geoms(dfs: Dfs, geom_names: list[str], workers: int = 1, cache: GeomCache = None,
+                     pool: ProcessPoolExecutor = None) -> dict[str, RigidGeom]:
+    """
+    Parse the named rigid geoms from the DFS, in a pool of worker processes if workers > 1.
+    To use the same workers for many calls, pass a dfs_process_pool of the DFS as pool.
+    Geoms found in the cache are loaded from it instead, and newly parsed geoms are added to it.
+    Geoms which are missing or fail to parse are left out of the result.
+    """
+    geom_names = list(dict.fromkeys(geom_names))
+    geoms = {}
+    to_parse = geom_names
+    if cache is not None:
+        to_parse = []
+        for geom_name in geom_names:
+            geom = cache.load(dfs, geom_name)
+            if geom is None:
+                to_parse.append(geom_name)
+            else:
+                geoms[geom_name] = geom
+
+    parsed = _parse_rigid_geoms(dfs, to_parse, workers, pool)
+    if cache is not None:
+        for geom_name, geom in parsed.items():
+            cache.store(dfs, geom_name, geom)
+    geoms.update(parsed)
+    # keep the order of geom_names
+    return {geom_name: geoms[geom_name] for geom_name in geom_names if geom_name in geoms}
+
+def _parse_rigid_geoms(dfs: Dfs, geom_names: list[str], workers: int,
+                       pool: ProcessPoolExecutor = None) -> dict[str, RigidGeom]:
+    geoms = {}
+    if not geom_names:
+        return geoms
+    if pool is None and workers <= 1:
+        for geom_name in geom_names:
+            geom = read_rigid_geom(geom_name, dfs.get_file(geom_name))
+            if geom is not None:
+                geoms[geom_name] = geom
+        return geoms
+
+    if pool is None:
+        with dfs_process_pool(dfs, workers) as pool:
+            return _parse_rigid_geoms_in_pool(dfs, geom_names, pool)
+    return _parse_rigid_geoms_in_pool(dfs, geom_names, pool)
+
+def _parse_rigid_geoms_in_pool(dfs: Dfs, geom_names: list[str], pool: ProcessPoolExecutor) -> dict[str, RigidGeom]:
+    geoms = {}
+    futures = {}
+    for geom_name in geom_names:
+        entry = dfs.get_entry(geom_name)
+        if entry is None:
+            read_rigid_geom(geom_name, None)
+            continue
+        future = pool.submit(_read_rigid_geom_worker, geom_name, entry['data_offset'], entry['data_length'])
+        futures[future] = geom_name
+    for future in as_completed(futures):
+        geom = future.result()
+        if geom is not None:
+            geoms[futures[future]] = geom
+    return geoms
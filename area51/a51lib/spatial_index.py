@@ -0,0 +1,128 @@
+import numpy as np
+
+from .playsurface import Playsurface, Surface, ZoneInfo
+from .vecmath import aabb_reduce_by_group, aabbs_from_bboxes
+
+class SpatialIndex:
+    """
+    Queries of the playsurface's own spatial database.
+
+    The hash table's chains are walked once to map each cell's (x, y, z) to its record. A surface
+    is only listed by one cell, but its box can reach into neighbouring cells, so queries also look
+    at cells up to reach cells away, then check the candidates' bounding boxes exactly.
+    Queries return Surface objects, or with the *_ids methods (zone number, surface number) pairs
+    into zones, which is the playsurface's zones followed by its portals.
+    """
+
+    cell_size: float
+    zones: list[ZoneInfo]
+    # (x, y, z) -> index of the cell record
+    cells: dict[tuple[int, int, int], int]
+    cell_records: np.ndarray
+    # (min, max) box around the surfaces of each cell
+    cell_aabbs: np.ndarray
+    # how many cells away from its own cell a surface can reach
+    reach: int
+    # (zone number, surface number) and (min, max) box by spatial database surface number
+    surface_ids: np.ndarray
+    aabbs: np.ndarray
+
+    def __init__(self, playsurface: Playsurface):
+        """ Raises ValueError if the spatial database is inconsistent with the zones. """
+        self.cell_size = playsurface.cell_size
+        if self.cell_size <= 0:
+            raise ValueError(f"Invalid spatial database cell size: {self.cell_size}")
+        self.zones = playsurface.zones + playsurface.portals
+
+        num_surfaces = max((zone.first_surface + len(zone) for zone in self.zones), default=0)
+        self.surface_ids = np.full((num_surfaces, 2), -1, dtype=np.int32)
+        self.aabbs = np.zeros((num_surfaces, 6))
+        for zone_no, zone in enumerate(self.zones):
+            surfaces = slice(zone.first_surface, zone.first_surface + len(zone))
+            self.surface_ids[surfaces, 0] = zone_no
+            self.surface_ids[surfaces, 1] = np.arange(len(zone))
+            self.aabbs[surfaces] = aabbs_from_bboxes(zone.bboxes)
+
+        self.cell_records = playsurface.spatial_cells
+        self.cells = self._walk_hash_chains(playsurface.spatial_hash, self.cell_records)
+
+        firsts = self.cell_records['first_surface'].astype(np.int64)
+        counts = self.cell_records['num_surfaces'].astype(np.int64)
+        if np.any(firsts < 0) or np.any(counts < 0) or np.any(firsts + counts > num_surfaces):
+            raise ValueError("Spatial database cell refers to surfaces which don't exist")
+        # the surfaces of each cell, and the cell each is in
+        surface_cells = np.repeat(np.arange(len(counts)), counts)
+        surface_nos = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - firsts, counts)
+        self.cell_aabbs = aabb_reduce_by_group(self.aabbs[surface_nos], surface_cells, len(counts))
+
+        self.reach = 0
+        if len(surface_nos):
+            coords = np.column_stack((self.cell_records['x'], self.cell_records['y'], self.cell_records['z']))[surface_cells]
+            below = coords - self._cell(self.aabbs[surface_nos, 0:3])
+            above = self._cell(self.aabbs[surface_nos, 3:6]) - coords
+            self.reach = int(max(below.max(), above.max(), 0))
+
+    @staticmethod
+    def _walk_hash_chains(spatial_hash: np.ndarray, cell_records: np.ndarray) -> dict[tuple[int, int, int], int]:
+        nexts = cell_records['next'].tolist()
+        coords = list(zip(cell_records['x'].tolist(), cell_records['y'].tolist(), cell_records['z'].tolist()))
+        cells = {}
+        for first_cell, num_cells in spatial_hash.tolist():
+            cell_no = first_cell
+            chain_length = 0
+            while cell_no != -1:
+                if not 0 <= cell_no < len(coords) or coords[cell_no] in cells:
+                    raise ValueError(f"Spatial database hash chain is broken at cell {cell_no}")
+                cells[coords[cell_no]] = cell_no
+                cell_no = nexts[cell_no]
+                chain_length += 1
+            if chain_length != max(num_cells, 0):
+                raise ValueError(f"Spatial database hash chain has {chain_length} cells, expected {num_cells}")
+        if len(cells) != len(coords):
+            raise ValueError("Spatial database has cells which no hash chain reaches")
+        return cells
+
+    def _cell(self, points) -> np.ndarray:
+        return np.floor(np.asarray(points, dtype=float) / self.cell_size).astype(int)
+
+    def _candidate_cells(self, cell_min, cell_max) -> list[int]:
+        (x0, y0, z0), (x1, y1, z1) = cell_min, cell_max
+        if (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1) > len(self.cells):
+            # a query larger than the occupied grid, so look at every cell
+            return [cell_no for (x, y, z), cell_no in self.cells.items()
+                    if x0 <= x <= x1 and y0 <= y <= y1 and z0 <= z <= z1]
+        candidates = []
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                for z in range(z0, z1 + 1):
+                    cell_no = self.cells.get((x, y, z))
+                    if cell_no is not None:
+                        candidates.append(cell_no)
+        return candidates
+
+    def query_aabb_ids(self, bbox_min, bbox_max) -> np.ndarray:
+        """ (zone number, surface number) of the surfaces whose bounding boxes overlap the box. """
+        bbox_min = np.asarray(bbox_min, dtype=float)
+        bbox_max = np.asarray(bbox_max, dtype=float)
+        cell_nos = np.array(self._candidate_cells(self._cell(bbox_min) - self.reach, self._cell(bbox_max) + self.reach), dtype=int)
+        # cells whose surfaces are all outside the box can be skipped
+        cell_aabbs = self.cell_aabbs[cell_nos]
+        cell_nos = cell_nos[np.all((cell_aabbs[:, 0:3] <= bbox_max) & (cell_aabbs[:, 3:6] >= bbox_min), axis=1)]
+
+        records = self.cell_records[cell_nos]
+        candidates = np.concatenate([np.arange(first, first + count) for first, count
+                                     in zip(records['first_surface'].tolist(), records['num_surfaces'].tolist())] +
+                                    [np.zeros(0, dtype=int)])
+        aabbs = self.aabbs[candidates]
+        overlaps = np.all((aabbs[:, 0:3] <= bbox_max) & (aabbs[:, 3:6] >= bbox_min), axis=1)
+        return self.surface_ids[np.unique(candidates[overlaps])]
+
+    def query_point_ids(self, point) -> np.ndarray:
+        """ (zone number, surface number) of the surfaces whose bounding boxes contain the point. """
+        return self.query_aabb_ids(point, point)
+
+    def query_aabb(self, bbox_min, bbox_max) -> list[Surface]:
+        return [self.zones[zone_no].surface(surf_no) for zone_no, surf_no in self.query_aabb_ids(bbox_min, bbox_max)]
+
+    def query_point(self, point) -> list[Surface]:
+        return [self.zones[zone_no].surface(surf_no) for zone_no, surf_no in self.query_point_ids(point)]
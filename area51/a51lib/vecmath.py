@@ -7,6 +7,40 @@ class Matrix4x4:
     def __init__(self):
         self.m4 = np.eye(4)
 
+    @classmethod
+    def from_column_major(cls, floats: list[float]) -> 'Matrix4x4':
+        """ Create from 16 floats stored column major, as A51 stores its matrices. """
+        mtx = cls()
+        mtx.m4 = np.array(floats, dtype=float).reshape([4, 4]).T
+        return mtx
+
+    @classmethod
+    def from_pos_rot(cls, pos: list[float], rot: list[float]) -> 'Matrix4x4':
+        """ Create from a position and a (pitch, yaw, roll) rotation in radians, as level objects store them.
+            Roll (about z) is applied first, then pitch (about x), then yaw (about y).
+        """
+        pitch, yaw, roll = rot
+        cp, sp = np.cos(pitch), np.sin(pitch)
+        cy, sy = np.cos(yaw), np.sin(yaw)
+        cr, sr = np.cos(roll), np.sin(roll)
+        rot_x = np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]])
+        rot_y = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+        rot_z = np.array([[cr, -sr, 0], [sr, cr, 0], [0, 0, 1]])
+        mtx = cls()
+        mtx.m4[:3, :3] = rot_y @ rot_x @ rot_z
+        mtx.m4[:3, 3] = pos
+        return mtx
+
+    def to_column_major(self) -> list[float]:
+        """ The 16 floats column major, the inverse of from_column_major. """
+        return self.m4.T.flatten().tolist()
+
+    def multiply(self, other: 'Matrix4x4') -> 'Matrix4x4':
+        """ Returns self @ other, i.e. a matrix which applies other and then self. """
+        mtx = Matrix4x4()
+        mtx.m4 = self.m4 @ other.m4
+        return mtx
+
     def scale(self, val):
         scaling_matrix = np.array([[val, 0, 0, 0],
                                   [0, val, 0, 0],
@@ -38,6 +72,49 @@ class Matrix4x4:
         x1, y1, z1, _ = self.m4 @ [x, y, z, 1]
         return (x1, y1, z1)
 
+    def transform_points(self, points: np.ndarray) -> np.ndarray:
+        """ Transform an (N, 3) array of points in one go. """
+        points = np.asarray(points, dtype=float)
+        return points @ self.m4[:3, :3].T + self.m4[:3, 3]
+
+
+# Batched axis aligned boxes. An aabb array has shape (..., 6) holding min x, y, z then max x, y, z.
+
+def aabbs_from_bboxes(bboxes: np.ndarray) -> np.ndarray:
+    """ Convert (N, 8) boxes stored as min xyzw, max xyzw (as in playsurfaces) to (N, 6). """
+    bboxes = np.asarray(bboxes, dtype=float)
+    return np.concatenate((bboxes[..., 0:3], bboxes[..., 4:7]), axis=-1)
+
+def aabb_union(aabbs: np.ndarray) -> np.ndarray:
+    """ The (6,) box around an (N, 6) array of boxes. """
+    aabbs = np.asarray(aabbs, dtype=float).reshape(-1, 6)
+    return np.concatenate((aabbs[:, 0:3].min(axis=0), aabbs[:, 3:6].max(axis=0)))
+
+def aabb_transform(aabbs: np.ndarray, mtx: Matrix4x4) -> np.ndarray:
+    """ Transform boxes by transforming all 8 corners of each and boxing the results. """
+    aabbs = np.asarray(aabbs, dtype=float)
+    shape = aabbs.shape
+    aabbs = aabbs.reshape(-1, 6)
+    # pick min or max for each axis, for every corner
+    select = np.array([[x, y, z] for x in (0, 3) for y in (1, 4) for z in (2, 5)])
+    corners = aabbs[:, select]
+    transformed = mtx.transform_points(corners.reshape(-1, 3)).reshape(-1, 8, 3)
+    return np.concatenate((transformed.min(axis=1), transformed.max(axis=1)), axis=-1).reshape(shape)
+
+def aabb_reduce_by_group(aabbs: np.ndarray, groups: np.ndarray, num_groups: int = None) -> np.ndarray:
+    """ The (num_groups, 6) boxes around the boxes of each group, e.g. the surfaces of each zone.
+        Groups with no boxes get an inverted (+inf, -inf) box.
+    """
+    aabbs = np.asarray(aabbs, dtype=float).reshape(-1, 6)
+    groups = np.asarray(groups, dtype=int)
+    if num_groups is None:
+        num_groups = int(groups.max()) + 1 if len(groups) else 0
+    mins = np.full((num_groups, 3), np.inf)
+    maxs = np.full((num_groups, 3), -np.inf)
+    np.minimum.at(mins, groups, aabbs[:, 0:3])
+    np.maximum.at(maxs, groups, aabbs[:, 3:6])
+    return np.concatenate((mins, maxs), axis=1)
+
 
 class BoundingBox:
 
@@ -87,10 +164,15 @@ class BoundingBox:
         )
 
     def transform(self, mtx: Matrix4x4) -> 'BoundingBox':
-        x0, y0, z0 = mtx.transform(self.min_x, self.min_y, self.min_z)
-        x1, y1, z1 = mtx.transform(self.max_x, self.max_y, self.max_z)
+        """ The box around all 8 transformed corners, so it is still correct under rotation. """
+        return BoundingBox.from_aabb(aabb_transform(self.to_aabb(), mtx))
+
+    def to_aabb(self) -> np.ndarray:
+        return np.array([self.min_x, self.min_y, self.min_z, self.max_x, self.max_y, self.max_z], dtype=float)
 
-        return BoundingBox([min(x0, x1), min(y0, y1), min(z0, z1), max(x0, x1), max(y0, y1), max(z0, z1)])
+    @classmethod
+    def from_aabb(cls, aabb: np.ndarray) -> 'BoundingBox':
+        return cls(np.asarray(aabb, dtype=float).tolist())
 
     def __repr__(self):
         return f"BoundingBox({self.min_x}, {self.min_y}, {self.min_z}, {self.max_x}, {self.max_y}, {self.max_z})"
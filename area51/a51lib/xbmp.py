@@ -1,16 +1,210 @@
 
 from enum import IntEnum
+import numpy as np
 import png
 
 from .data_reader import DataReader
 
 class XBmpFormat(IntEnum):
+    # Names describe the packed pixel (or palette entry) from the most significant bit down,
+    # e.g. ARGB_1555 is a 16 bit value with alpha in bit 15. U is an unused channel.
+    FMT_NULL = 0
+
+    FMT_RGBA_8888 = 1
+    FMT_RGBU_8888 = 2
     FMT_ARGB_8888 = 3
+    FMT_URGB_8888 = 4
+    FMT_RGB_888 = 5
+    FMT_RGBA_4444 = 6
+    FMT_ARGB_4444 = 7
+    FMT_RGBA_5551 = 8
+    FMT_RGBU_5551 = 9
+    FMT_ARGB_1555 = 10
+    FMT_URGB_1555 = 11
+    FMT_RGB_565 = 12
+    FMT_BGRA_8888 = 13
+    FMT_BGRU_8888 = 14
+    FMT_ABGR_8888 = 15
+    FMT_UBGR_8888 = 16
+    FMT_BGR_888 = 17
+    FMT_BGRA_4444 = 18
+    FMT_ABGR_4444 = 19
+    FMT_BGRA_5551 = 20
+    FMT_BGRU_5551 = 21
+    FMT_ABGR_1555 = 22
+    FMT_UBGR_1555 = 23
+    FMT_BGR_565 = 24
+
+    FMT_P8_RGBA_8888 = 25
+    FMT_P8_RGBU_8888 = 26
+    FMT_P8_ARGB_8888 = 27
+    FMT_P8_URGB_8888 = 28
+    FMT_P8_RGB_888 = 29
+    FMT_P8_RGBA_4444 = 30
+    FMT_P8_ARGB_4444 = 31
+    FMT_P8_RGBA_5551 = 32
+    FMT_P8_RGBU_5551 = 33
+    FMT_P8_ARGB_1555 = 34
+    FMT_P8_URGB_1555 = 35
+    FMT_P8_RGB_565 = 36
+    FMT_P8_BGRA_8888 = 37
+    FMT_P8_BGRU_8888 = 38
+    FMT_P8_ABGR_8888 = 39
+    FMT_P8_UBGR_8888 = 40
+    FMT_P8_BGR_888 = 41
+    FMT_P8_BGRA_4444 = 42
+    FMT_P8_ABGR_4444 = 43
+    FMT_P8_BGRA_5551 = 44
+    FMT_P8_BGRU_5551 = 45
+    FMT_P8_ABGR_1555 = 46
+    FMT_P8_UBGR_1555 = 47
+    FMT_P8_BGR_565 = 48
+
+    FMT_P4_RGBA_8888 = 49
+    FMT_P4_RGBU_8888 = 50
+    FMT_P4_ARGB_8888 = 51
+    FMT_P4_URGB_8888 = 52
+    FMT_P4_RGB_888 = 53
+    FMT_P4_RGBA_4444 = 54
+    FMT_P4_ARGB_4444 = 55
+    FMT_P4_RGBA_5551 = 56
+    FMT_P4_RGBU_5551 = 57
+    FMT_P4_ARGB_1555 = 58
+    FMT_P4_URGB_1555 = 59
+    FMT_P4_RGB_565 = 60
+    FMT_P4_BGRA_8888 = 61
+    FMT_P4_BGRU_8888 = 62
+    FMT_P4_ABGR_8888 = 63
+    FMT_P4_UBGR_8888 = 64
+    FMT_P4_BGR_888 = 65
+    FMT_P4_BGRA_4444 = 66
+    FMT_P4_ABGR_4444 = 67
+    FMT_P4_BGRA_5551 = 68
+    FMT_P4_BGRU_5551 = 69
+    FMT_P4_ABGR_1555 = 70
+    FMT_P4_UBGR_1555 = 71
+    FMT_P4_BGR_565 = 72
+
+    FMT_DXT1 = 73
+    FMT_DXT2 = 74
+    FMT_DXT3 = 75
+    FMT_DXT4 = 76
+    FMT_DXT5 = 77
+    FMT_A8 = 78
+
+def _format_layout(fmt: XBmpFormat) -> tuple[int, str, str]:
+   """ Split a format name into (palette index bits, channels, channel bits), e.g. FMT_P8_ARGB_1555 -> (8, 'ARGB', '1555'). """
+   parts = fmt.name.split('_')[1:]
+   index_bits = 0
+   if parts[0] in ('P4', 'P8'):
+      index_bits = int(parts[0][1])
+      parts = parts[1:]
+   return index_bits, parts[0], parts[1]
+
+def _unpack_channels(words: np.ndarray, channels: str, bits: str) -> np.ndarray:
+   """ Unpack an array of packed pixel values into an array of RGBA bytes with one more dimension. """
+   rgba = np.empty(words.shape + (4,), dtype=np.uint8)
+   rgba[..., 3] = 255
+   shift = sum(int(b) for b in bits)
+   for channel, channel_bits in zip(channels, bits):
+      channel_bits = int(channel_bits)
+      shift -= channel_bits
+      if channel == 'U':
+         continue
+      max_value = (1 << channel_bits) - 1
+      values = (words >> shift) & max_value
+      if channel_bits != 8:
+         # expand to the full 0-255 range
+         values = (values * 255 + max_value // 2) // max_value
+      rgba[..., 'RGBA'.index(channel)] = values
+   return rgba
+
+def _read_words(data, count: int, bytes_per_pixel: int) -> np.ndarray:
+   """ Read count little endian pixel values of 2, 3 or 4 bytes as uint32. """
+   if bytes_per_pixel == 3:
+      raw = np.frombuffer(data, dtype=np.uint8, count=count * 3).reshape(count, 3).astype(np.uint32)
+      return raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+   dtype = '<u2' if bytes_per_pixel == 2 else '<u4'
+   return np.frombuffer(data, dtype=dtype, count=count).astype(np.uint32)
+
+def _rgb565_to_rgb(values: np.ndarray) -> np.ndarray:
+   return _unpack_channels(values.astype(np.uint32), 'RGB', '565')[..., :3].astype(np.uint32)
+
+def _decode_dxt_colour(blocks: np.ndarray, always_four_colours: bool) -> np.ndarray:
+   """ Decode the 8 byte colour part of each DXT block to (num blocks, 16, 4) RGBA. """
+   c0 = blocks[:, 0].astype(np.uint32) | (blocks[:, 1].astype(np.uint32) << 8)
+   c1 = blocks[:, 2].astype(np.uint32) | (blocks[:, 3].astype(np.uint32) << 8)
+   rgb0 = _rgb565_to_rgb(c0)
+   rgb1 = _rgb565_to_rgb(c1)
+   four_colours = (c0 > c1) | always_four_colours
+
+   palette = np.zeros((len(blocks), 4, 4), dtype=np.uint32)
+   palette[:, 0, :3] = rgb0
+   palette[:, 1, :3] = rgb1
+   palette[:, :2, 3] = 255
+   palette[:, 2, :3] = np.where(four_colours[:, None], (2 * rgb0 + rgb1) // 3, (rgb0 + rgb1) // 2)
+   palette[:, 3, :3] = np.where(four_colours[:, None], (rgb0 + 2 * rgb1) // 3, 0)
+   palette[:, 2, 3] = 255
+   # in 3 colour mode index 3 is transparent black
+   palette[:, 3, 3] = np.where(four_colours, 255, 0)
+
+   bits = blocks[:, 4:8].copy().view('<u4')[:, 0]
+   indices = (bits[:, None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+   return np.take_along_axis(palette, indices[..., None].astype(np.intp), axis=1).astype(np.uint8)
+
+def _decode_dxt3_alpha(blocks: np.ndarray) -> np.ndarray:
+   """ Explicit 4 bit alpha, to (num blocks, 16). """
+   bits = blocks[:, 0:8].copy().view('<u8')[:, 0]
+   alpha = (bits[:, None] >> (4 * np.arange(16, dtype=np.uint64))) & 0xf
+   return (alpha * 17).astype(np.uint8)
+
+def _decode_dxt5_alpha(blocks: np.ndarray) -> np.ndarray:
+   """ Interpolated alpha, to (num blocks, 16). """
+   a0 = blocks[:, 0].astype(np.uint32)
+   a1 = blocks[:, 1].astype(np.uint32)
+   eight_alphas = (a0 > a1)[:, None]
+   steps = np.arange(1, 7, dtype=np.uint32)
+   interpolated_8 = ((7 - steps) * a0[:, None] + steps * a1[:, None]) // 7
+   steps = np.arange(1, 5, dtype=np.uint32)
+   interpolated_6 = ((5 - steps) * a0[:, None] + steps * a1[:, None]) // 5
+   # with 6 alphas the last two are fully transparent and fully opaque
+   six_alphas = np.concatenate((interpolated_6, np.zeros((len(blocks), 1), dtype=np.uint32),
+                                np.full((len(blocks), 1), 255, dtype=np.uint32)), axis=1)
+   palette = np.empty((len(blocks), 8), dtype=np.uint32)
+   palette[:, 0] = a0
+   palette[:, 1] = a1
+   palette[:, 2:] = np.where(eight_alphas, interpolated_8, six_alphas)
+
+   raw = np.zeros((len(blocks), 8), dtype=np.uint8)
+   raw[:, :6] = blocks[:, 2:8]
+   bits = raw.view('<u8')[:, 0]
+   indices = (bits[:, None] >> (3 * np.arange(16, dtype=np.uint64))) & 7
+   return np.take_along_axis(palette, indices.astype(np.intp), axis=1).astype(np.uint8)
+
+def _decode_dxt(data, fmt: XBmpFormat, width: int, height: int) -> np.ndarray:
+   """ Decode all the 4x4 blocks of a DXT image at once, to (height, width, 4) RGBA. """
+   blocks_wide = max(1, (width + 3) // 4)
+   blocks_high = max(1, (height + 3) // 4)
+   block_size = 8 if fmt == XBmpFormat.FMT_DXT1 else 16
+   num_blocks = blocks_wide * blocks_high
+   blocks = np.frombuffer(data, dtype=np.uint8, count=num_blocks * block_size).reshape(num_blocks, block_size)
+   if fmt == XBmpFormat.FMT_DXT1:
+      rgba = _decode_dxt_colour(blocks, False)
+   else:
+      # DXT2 and DXT4 are the premultiplied alpha versions of DXT3 and DXT5. They are left premultiplied.
+      rgba = _decode_dxt_colour(blocks[:, 8:16], True)
+      if fmt in (XBmpFormat.FMT_DXT2, XBmpFormat.FMT_DXT3):
+         rgba[..., 3] = _decode_dxt3_alpha(blocks)
+      else:
+         rgba[..., 3] = _decode_dxt5_alpha(blocks)
+   # (block row, block column, pixel row, pixel column, channel) -> image rows and columns
+   rgba = rgba.reshape(blocks_high, blocks_wide, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+   return rgba.reshape(blocks_high * 4, blocks_wide * 4, 4)[:height, :width]
 
 class XBmp:
      
-   orig_pixel_data: bytes
-   clut_data: bytes
+   orig_pixel_data: bytes | memoryview
+   clut_data: bytes | memoryview
 
    width: int
    height: int
@@ -31,32 +225,102 @@ class XBmp:
          self.clut_data = reader.read_byte_array(self.clut_size)
       else:
          self.clut_data = None
-      
-   
+
+   def mip_levels(self) -> list[tuple[int, int, int, int]]:
+      """ The (offset, width, height, physical width) of each mip level in the pixel data. """
+      if self.num_mips > 0:
+         # The pixel data starts with a table of (offset, width, height) per level.
+         # Only trust it if it describes the top level.
+         count = self.num_mips + 1
+         if count * 8 <= self.data_size:
+            table = np.frombuffer(self.orig_pixel_data, dtype=[('offset', '<i4'), ('width', '<i2'), ('height', '<i2')],
+                                  count=count)
+            if (table[0]['width'] == self.width and table[0]['height'] == self.height
+                  and np.all((table['offset'] >= count * 8) & (table['offset'] < self.data_size))):
+               levels = [(int(table[0]['offset']), self.width, self.height, self.physical_width)]
+               for entry in table[1:]:
+                  levels.append((int(entry['offset']), int(entry['width']), int(entry['height']), int(entry['width'])))
+               return levels
+
+      # Otherwise the levels follow each other, each half the size of the last.
+      levels = []
+      offset = 0
+      width, height, physical_width = self.width, self.height, self.physical_width
+      for _ in range(max(self.num_mips, 0) + 1):
+         levels.append((offset, width, height, physical_width))
+         offset += self._level_size(physical_width, height)
+         width, height, physical_width = max(width // 2, 1), max(height // 2, 1), max(physical_width // 2, 1)
+         if offset >= self.data_size:
+            break
+      return levels
+
+   def pixel_format(self) -> XBmpFormat:
+      """ The format, raising ValueError if there are no pixels to decode in it. """
+      try:
+         fmt = XBmpFormat(self.format)
+      except ValueError:
+         raise ValueError(f"Unsupported XBmp format: {self.format}")
+      if fmt == XBmpFormat.FMT_NULL:
+         raise ValueError("XBmp has no pixel format")
+      return fmt
+
+   def _level_size(self, physical_width: int, height: int) -> int:
+      fmt = self.pixel_format()
+      if fmt in (XBmpFormat.FMT_DXT1, XBmpFormat.FMT_DXT2, XBmpFormat.FMT_DXT3,
+                 XBmpFormat.FMT_DXT4, XBmpFormat.FMT_DXT5):
+         block_size = 8 if fmt == XBmpFormat.FMT_DXT1 else 16
+         return max(1, (physical_width + 3) // 4) * max(1, (height + 3) // 4) * block_size
+      if fmt == XBmpFormat.FMT_A8:
+         return physical_width * height
+      index_bits, _, bits = _format_layout(fmt)
+      pixel_bits = index_bits if index_bits else sum(int(b) for b in bits)
+      return (physical_width * height * pixel_bits + 7) // 8
+
+   def to_rgba_array(self, mip: int = 0) -> np.ndarray:
+      """ The pixels of a mip level as a (height, width, 4) uint8 array of RGBA. """
+      offset, width, height, physical_width = self.mip_levels()[mip]
+      data = memoryview(self.orig_pixel_data)[offset:]
+      rgba = self._decode(data, physical_width, height)
+      # drop the padding at the end of each row
+      return rgba[:, :width]
+
+   def _decode(self, data, physical_width: int, height: int) -> np.ndarray:
+      """ Decode one level to a (height, physical width, 4) RGBA array. """
+      fmt = self.pixel_format()
+      if fmt in (XBmpFormat.FMT_DXT1, XBmpFormat.FMT_DXT2, XBmpFormat.FMT_DXT3,
+                 XBmpFormat.FMT_DXT4, XBmpFormat.FMT_DXT5):
+         return _decode_dxt(data, fmt, physical_width, height)
+
+      num_pixels = physical_width * height
+      if fmt == XBmpFormat.FMT_A8:
+         rgba = np.full((num_pixels, 4), 255, dtype=np.uint8)
+         rgba[:, 3] = np.frombuffer(data, dtype=np.uint8, count=num_pixels)
+         return rgba.reshape(height, physical_width, 4)
+
+      index_bits, channels, bits = _format_layout(fmt)
+      bytes_per_pixel = sum(int(b) for b in bits) // 8
+      if index_bits == 0:
+         words = _read_words(data, num_pixels, bytes_per_pixel)
+         return _unpack_channels(words, channels, bits).reshape(height, physical_width, 4)
+
+      if self.clut_data is None:
+         raise ValueError(f"Palettised XBmp format {fmt.name} has no clut data")
+      num_colours = self.clut_size // bytes_per_pixel
+      palette = _unpack_channels(_read_words(self.clut_data, num_colours, bytes_per_pixel), channels, bits)
+      if index_bits == 8:
+         indices = np.frombuffer(data, dtype=np.uint8, count=num_pixels)
+      else:
+         # two pixels per byte, the first in the low nibble
+         packed = np.frombuffer(data, dtype=np.uint8, count=(num_pixels + 1) // 2)
+         indices = np.stack((packed & 0xf, packed >> 4), axis=1).reshape(-1)[:num_pixels]
+      indices = np.minimum(indices, num_colours - 1)
+      return np.take(palette, indices, axis=0).reshape(height, physical_width, 4)
 
    def write_png(self, filename):
-      converted_pixel_data = self._convert_to_32bpp()
-      argb_data = []
-      for row in range (0, self.height):
-         row_pix = []
-         argb_data.append(row_pix)
-         pix_idx = row * self.physical_width * 4
-         for _ in range (0, self.width):
-            row_pix.append(converted_pixel_data[pix_idx + 2])
-            row_pix.append(converted_pixel_data[pix_idx + 1])
-            row_pix.append(converted_pixel_data[pix_idx + 0])
-            row_pix.append(converted_pixel_data[pix_idx + 3])
-            pix_idx += 4
-      png_obj = png.from_array(argb_data, mode='RGBA')
+      rgba = self.to_rgba_array()
+      writer = png.Writer(self.width, self.height, alpha=True, greyscale=False)
       with open(filename, 'wb') as file:
-         png_obj.write(file)
-
+         # each row is handed over as a buffer, no per pixel work
+         writer.write(file, rgba.reshape(self.height, self.width * 4))
 
 # pypng docs https://drj11.gitlab.io/pypng/
-   def _convert_to_32bpp(self):
-      if self.format == XBmpFormat.FMT_ARGB_8888:
-         return self.orig_pixel_data
-      print("*** Unimplemented format: " + str(format))
-      
-
-     
\ No newline at end of file
@@ -0,0 +1,22 @@
+from .dfs_pool import worker_dfs
+from .xbmp import XBmp
+
+# Kept apart from blender.bitmap_exporter so that worker processes don't import Blender.
+
+def export_bitmap(xbmp_data, output_filename: str) -> str | None:
+    """
+    Decode a bitmap and write it as a PNG.
+
+    :return: None on success, otherwise a description of the error.
+    """
+    try:
+        xbmp = XBmp()
+        xbmp.read(xbmp_data)
+        xbmp.write_png(output_filename)
+    except (ValueError, OSError) as e:
+        return str(e)
+    return None
+
+def export_bitmap_worker(offset: int, length: int, output_filename: str) -> str | None:
+    """ Runs in a worker process, which reads the bitmap from its own mapping of the DFS. """
+    return export_bitmap(worker_dfs().read_data(offset, length), output_filename)
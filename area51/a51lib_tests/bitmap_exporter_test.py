@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from a51lib.dfs import Dfs
+from a51lib.xbmp import XBmpFormat
+from a51lib_tests.dfs_test import write_dfs
+from a51lib_tests.xbmp_test import build_xbmp
+from blender.bitmap_exporter import export_bitmaps, load_manifest
+
+
+def make_xbmp(value):
+    return build_xbmp(bytes([value, value, value, 255]), 1, 1, 1, XBmpFormat.FMT_ARGB_8888)
+
+
+class TestExportBitmaps(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self.tmp_dir.name, 'textures')
+        # two levels which share the wall texture
+        self.level_a = self.open_dfs('LEVEL_A', [('wall', '.xbmp', make_xbmp(1)), ('crate', '.xbmp', make_xbmp(2))])
+        self.level_b = self.open_dfs('LEVEL_B', [('wall', '.xbmp', make_xbmp(1)), ('floor', '.xbmp', make_xbmp(3))])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def open_dfs(self, name, files):
+        base = os.path.join(self.tmp_dir.name, name)
+        write_dfs(base, files)
+        dfs = Dfs()
+        dfs.open(base)
+        return dfs
+
+    def png_exists(self, name):
+        return os.path.exists(os.path.join(self.output_path, name + '.png'))
+
+    def test_skips_unchanged(self):
+        exported = []
+        progress = lambda num_done, total, xbmp_file: exported.append(xbmp_file)
+        export_bitmaps(self.level_a, self.output_path, progress=progress)
+        export_bitmaps(self.level_a, self.output_path, progress=progress)
+        self.assertEqual(sorted(exported), ['crate.xbmp', 'wall.xbmp'])
+
+    def test_overlapping_exports_keep_shared_pngs(self):
+        self.assertEqual(export_bitmaps(self.level_a, self.output_path), {})
+        self.assertEqual(export_bitmaps(self.level_b, self.output_path), {})
+        self.assertEqual(sorted(load_manifest(self.output_path)['textures']['wall.png']['users']),
+                         sorted([os.path.abspath(self.level_a.base_filename), os.path.abspath(self.level_b.base_filename)]))
+
+        # level A stops using the wall, which level B still uses
+        export_bitmaps(self.level_a, self.output_path, xbmp_files=['crate.xbmp'])
+        self.assertTrue(self.png_exists('wall'))
+        self.assertTrue(self.png_exists('floor'))
+
+        # now nothing uses it
+        export_bitmaps(self.level_b, self.output_path, xbmp_files=['floor.xbmp'])
+        self.assertFalse(self.png_exists('wall'))
+        self.assertTrue(self.png_exists('crate'))
+        self.assertNotIn('wall.png', load_manifest(self.output_path)['textures'])
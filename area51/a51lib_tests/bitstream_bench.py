@@ -0,0 +1,47 @@
+""" Bitstream throughput. Run from the area51 directory with: python -m a51lib_tests.bitstream_bench """
+import random
+import struct
+import timeit
+
+from a51lib.bitstream import Bitstream
+
+NUM_VALUES = 100000
+
+
+def make_property_data():
+    """ A bitstream of bools, floats, vectors and strings like a level's property data, not byte aligned. """
+    rng = random.Random(1)
+    bits = []
+    for _ in range(NUM_VALUES):
+        bits.append('1' if rng.random() < 0.5 else '0')
+        bits.append(''.join(f'{b:08b}' for b in struct.pack('>3f', rng.random(), rng.random(), rng.random())))
+        bits.append(''.join(f'{b:08b}' for b in bytes([8]) + b'texture\0'))
+    bits = ''.join(bits)
+    bits += '0' * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big')
+
+
+def read_properties(data):
+    bitstream = Bitstream(data)
+    for _ in range(NUM_VALUES):
+        bitstream.read_bool()
+        bitstream.read_v3()
+        bitstream._read_raw(8)
+        bitstream._read_raw_bits(64)
+
+
+def read_floats(data):
+    bitstream = Bitstream(data, 1)
+    for _ in range((len(data) - 1) // 4):
+        bitstream.read_float()
+
+
+def main():
+    data = make_property_data()
+    for name, func in (('properties', read_properties), ('floats', read_floats)):
+        seconds = min(timeit.repeat(lambda: func(data), number=1, repeat=3))
+        print(f'{name:12} {len(data) / seconds / 1e6:8.2f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
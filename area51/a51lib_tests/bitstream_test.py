@@ -1,6 +1,7 @@
+import random
 import unittest
 import struct
-from a51lib.bitstream import Bitstream
+from a51lib.bitstream import Bitstream, WINDOW_BYTES
 
 class TestBitstream(unittest.TestCase):
     def test_read_raw_simple_byte_aligned(self):
@@ -110,7 +111,56 @@ class TestBitstream(unittest.TestCase):
         data = bytes([0b11111111, 0b00000000, 0b10101010])
         bs = Bitstream(data, bitpos=5)
         bits = bs._read_raw_bits(12)
-        # You may expect to get bits: 11111000 00001010 (from bit 5 to bit 16)
-        # we don't though because the implemetation is reading byte-aligned
-        # and makes no sense other than it's a bug in the original code.
+        # Not 11111000 00001010 as reading from the top of each byte would give. Strings are
+        # packed from the bottom of each byte, as the game writes them: the 3 low bits left in
+        # the first byte (111), then the next 8 (00000000), then the low bit of the third (0),
+        # least significant first. See Bitstream._read_raw_bits.
         self.assertEqual(bits, bytearray([0b00000111, 0b00000000]))
+
+
+    def test_read_s32(self):
+        bs = Bitstream(struct.pack('>ii', -2, 123456))
+        self.assertEqual(bs.read_s32(), -2)
+        self.assertEqual(bs.read_s32(), 123456)
+
+    def test_read_u64(self):
+        bs = Bitstream(bytes([0xff]) + struct.pack('>Q', 0x0123456789abcdef), bitpos=8)
+        self.assertEqual(bs.read_u64(), 0x0123456789abcdef)
+
+    def test_read_bounding_box_values(self):
+        bs = Bitstream(struct.pack('>6f', -1, -2, -3, 4, 5, 6))
+        self.assertEqual(bs.read_bounding_box(), [-1, -2, -3, 4, 5, 6])
+
+    def test_read_colour_value(self):
+        bs = Bitstream(bytes([0x11, 0x22, 0x33, 0x44]))
+        self.assertEqual(bs.read_colour(), 0x11223344)
+
+    def test_read_raw_bits_matches_game(self):
+        # see Bitstream._read_raw_bits
+        bs = Bitstream(bytes([0x5c, 0x52]), bitpos=6)
+        self.assertEqual(bs._read_raw_bits(8), bytearray([0x48]))
+        self.assertEqual(bs.bitpos, 14)
+
+    def test_read_raw_after_bool(self):
+        # after a bool, the length byte straddles the first two bytes
+        data = bytes([0b10000001, 0b10000000]) + bytes(3)
+        bs = Bitstream(data)
+        self.assertTrue(bs.read_bool())
+        self.assertEqual(bs._read_raw(8), 3)
+
+    def test_read_past_end(self):
+        bs = Bitstream(bytes(2), bitpos=10)
+        with self.assertRaises(EOFError):
+            bs._read_raw(8)
+        with self.assertRaises(EOFError):
+            bs._read_raw_bits(8)
+
+    def test_reads_across_windows(self):
+        rng = random.Random(1)
+        data = bytes(rng.randrange(256) for _ in range(WINDOW_BYTES * 3))
+        bits = ''.join(f'{b:08b}' for b in data)
+        bs = Bitstream(data, bitpos=3)
+        while bs.bitpos + 64 <= len(bits):
+            num_bits = rng.randint(1, 64)
+            expected = int(bits[bs.bitpos:bs.bitpos + num_bits], 2)
+            self.assertEqual(bs._read_raw(num_bits), expected)
@@ -0,0 +1,31 @@
+import unittest
+
+from a51lib.data_reader import DataReader, find_nul, read_c_string, split_c_strings
+
+
+class TestCStrings(unittest.TestCase):
+    def test_read_c_string(self):
+        data = b'door\0\xe9t\xe9\0tail'
+        self.assertEqual(read_c_string(data), ('door', 5))
+        self.assertEqual(read_c_string(data, 5), ('\xe9t\xe9', 9))
+        # no terminator
+        self.assertEqual(read_c_string(data, 9), ('tail', 14))
+
+    def test_memoryview(self):
+        data = memoryview(b'x' * 200 + b'\0' + b'short\0')
+        self.assertEqual(find_nul(data), 200)
+        self.assertEqual(read_c_string(data, 201), ('short', 207))
+        self.assertEqual(find_nul(memoryview(b'none')), -1)
+
+    def test_split_c_strings(self):
+        strings = split_c_strings(memoryview(b'Door\0Base\\Position\0\0Light\0'))
+        self.assertEqual(strings, ['Door', 'Base\\Position', '', 'Light'])
+        self.assertIs(strings[0], split_c_strings(b'Door\0')[0])
+        self.assertEqual(split_c_strings(b''), [])
+        self.assertEqual(split_c_strings(b'a\0b'), ['a', 'b'])
+
+    def test_data_reader_read_string(self):
+        reader = DataReader(b'ab\0c\0')
+        self.assertEqual(reader.read_string(), 'ab')
+        self.assertEqual(reader.read_string(), 'c')
+        self.assertFalse(reader.has_data())
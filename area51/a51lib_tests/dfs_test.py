@@ -0,0 +1,129 @@
+import os
+import struct
+import tempfile
+import unittest
+from a51lib.dfs import Dfs
+
+
+def write_dfs(base_filename, files, split_size=0):
+    """ Write a minimal version 2 DFS with the given (name, ext, data) files. """
+    strings = bytearray()
+    string_offsets = {}
+
+    def add_string(s):
+        if s not in string_offsets:
+            string_offsets[s] = len(strings)
+            strings.extend(s.encode('utf-8') + b'\0')
+        return string_offsets[s]
+
+    entries = bytearray()
+    blob = bytearray()
+    for name, ext, data in files:
+        entries += struct.pack('IIIIII', add_string(name), add_string(''), add_string(''),
+                               add_string(ext), len(blob), len(data))
+        blob += data
+
+    header_size = 4 + 4 * 9
+    file_entry_offset = header_size
+    strings_offset = file_entry_offset + len(entries)
+    header = b'SFDX' + struct.pack('IIIIIIIII', 2, 2048, split_size, len(files), len(files),
+                                   len(strings), 0, file_entry_offset, strings_offset)
+    with open(base_filename + '.DFS', 'wb') as dfs_file:
+        dfs_file.write(header + entries + strings)
+
+    if split_size == 0:
+        split_size = max(len(blob), 1)
+    for part in range(max(1, (len(blob) + split_size - 1) // split_size)):
+        with open(base_filename + f'.{part:03d}', 'wb') as data_file:
+            data_file.write(blob[part * split_size:(part + 1) * split_size])
+
+
+class TestDfs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp_dir.name, 'RESOURCE')
+        write_dfs(self.base, [
+            ('Wall_A', '.XBMP', b'wall a'),
+            ('wall_b', '.xbmp', b'wall b'),
+            ('Crate', '.RIGIDGEOM', b'crate'),
+            ('LEVEL_DATA', '.INFO', b'info'),
+        ])
+        self.dfs = Dfs()
+        self.dfs.open(self.base)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_file_ignores_case(self):
+        self.assertEqual(self.dfs.get_file('wall_a.xbmp'), b'wall a')
+        self.assertEqual(self.dfs.get_file('CRATE.rigidgeom'), b'crate')
+
+    def test_get_file_missing(self):
+        self.assertIsNone(self.dfs.get_file('missing.xbmp'))
+
+    def test_get_filenames(self):
+        self.assertEqual(self.dfs.get_filenames('.XBMP'), ['Wall_A.XBMP', 'wall_b.xbmp'])
+        self.assertEqual(self.dfs.get_filenames('.tga'), [])
+
+    def test_get_filenames_with_prefix(self):
+        self.assertEqual(self.dfs.get_filenames_with_prefix('WALL_'), ['Wall_A.XBMP', 'wall_b.xbmp'])
+        self.assertEqual(self.dfs.get_filenames_with_prefix('zzz'), [])
+
+    def test_glob(self):
+        self.assertEqual(self.dfs.glob('*.xbmp'), ['Wall_A.XBMP', 'wall_b.xbmp'])
+        self.assertEqual(self.dfs.glob('wall_?.XBMP'), ['Wall_A.XBMP', 'wall_b.xbmp'])
+        self.assertEqual(self.dfs.glob('level_data.*'), ['LEVEL_DATA.INFO'])
+
+    def test_get_file_mmap(self):
+        with Dfs() as dfs:
+            dfs.open(self.base, use_mmap=True)
+            data = dfs.get_file('wall_b.xbmp')
+            self.assertIsInstance(data, memoryview)
+            self.assertEqual(bytes(data), b'wall b')
+            self.assertEqual(bytes(dfs.get_file('level_data.info')), b'info')
+        # the view outlives the mapping's owner
+        self.assertEqual(bytes(data), b'wall b')
+
+    def test_context_manager_keeps_one_handle(self):
+        with self.dfs:
+            self.assertEqual(self.dfs.get_file('crate.rigidgeom'), b'crate')
+            data_file = self.dfs._parts.get(0)
+            self.assertEqual(self.dfs.get_file('wall_a.xbmp'), b'wall a')
+            self.assertIs(self.dfs._parts.get(0), data_file)
+        self.assertTrue(data_file.closed)
+
+
+class TestSplitDfs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp_dir.name, 'RESOURCE')
+        # 8 byte parts: 'aaaaaa' fits in .000, 'bbbbbbbbbb' spans .000 to .002
+        write_dfs(self.base, [
+            ('first', '.bin', b'aaaaaa'),
+            ('second', '.bin', b'bbbbbbbbbbb'),
+            ('third', '.bin', b'cc'),
+        ], split_size=8)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_across_parts(self):
+        for use_mmap in (False, True):
+            with Dfs() as dfs:
+                dfs.open(self.base, use_mmap=use_mmap)
+                self.assertEqual(bytes(dfs.get_file('first.bin')), b'aaaaaa')
+                self.assertEqual(bytes(dfs.get_file('second.bin')), b'bbbbbbbbbbb')
+                self.assertEqual(bytes(dfs.get_file('third.bin')), b'cc')
+
+    def test_read_without_context(self):
+        dfs = Dfs()
+        dfs.open(self.base)
+        self.assertEqual(dfs.get_file('second.bin'), b'bbbbbbbbbbb')
+        self.assertEqual(len(dfs._parts), 0)
+
+    def test_open_parts_are_bounded(self):
+        with Dfs() as dfs:
+            dfs.open(self.base, use_mmap=True, max_open_parts=2)
+            self.assertEqual(bytes(dfs.get_file('second.bin')), b'bbbbbbbbbbb')
+            self.assertEqual(len(dfs._parts), 2)
+            self.assertNotIn(0, dfs._parts)
@@ -0,0 +1,129 @@
+import struct
+import unittest
+
+from a51lib.level_bin import LevelBin, PropertyType
+
+DICTIONARY = ['Door', 'Light', 'Base\\Position', 'Base\\Name', 'Light\\On', 'Light\\Colour', 'Base\\GUID',
+              'Base\\BBox', 'RenderInst\\File', 'Door\\Speed', 'Base\\Count']
+
+
+class BitWriter:
+    """ Writes bits in the order Bitstream reads them. """
+
+    def __init__(self):
+        self.bits = []
+        self.bitpos = 0
+
+    def _set(self, pos, bit):
+        self.bits.extend([0] * (pos + 1 - len(self.bits)))
+        self.bits[pos] = bit
+
+    def write(self, value, num_bits):
+        for shift in range(num_bits - 1, -1, -1):
+            self._set(self.bitpos, (value >> shift) & 1)
+            self.bitpos += 1
+
+    def write_float(self, value):
+        self.write(struct.unpack('>I', struct.pack('>f', value))[0], 32)
+
+    def write_string(self, s):
+        """ Must come last if it doesn't start on a byte boundary, see Bitstream._read_raw_bits. """
+        data = s.encode('latin-1') + b'\0'
+        self.write(len(data), 8)
+        value = int.from_bytes(data, 'little')
+        bit_offset = self.bitpos % 8
+        first_bits = 8 - bit_offset
+        byte_start = self.bitpos - bit_offset
+        for j in range(len(data) * 8):
+            k = j if j < first_bits else j - first_bits + 8
+            self._set(byte_start + (k // 8) * 8 + 7 - k % 8, (value >> j) & 1)
+        self.bitpos += len(data) * 8
+
+    def to_bytes(self):
+        bits = self.bits + [0] * (-len(self.bits) % 8)
+        return bytes(int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8))
+
+
+def build_level_bin(objects):
+    """ objects is a list of (type name, guid, [(property type, name, writer function)]).
+        Returns (bin_data, dict_data).
+    """
+    header_objects = b''
+    header_properties = b''
+    bits = BitWriter()
+    num_properties = 0
+    for type_name, guid, properties in objects:
+        header_objects += struct.pack('hhiQ', DICTIONARY.index(type_name), len(properties), num_properties, guid)
+        for prop_type, name, write in properties:
+            header_properties += struct.pack('HH', prop_type, DICTIONARY.index(name))
+            write(bits)
+            num_properties += 1
+    bitstream = bits.to_bytes()
+    header = struct.pack('<HiiiI', 1, 0, len(objects), num_properties, len(bitstream) * 8)
+    dict_data = b''.join(name.encode('ascii') + b'\0' for name in DICTIONARY)
+    return header + header_objects + header_properties + bitstream, dict_data
+
+
+class TestLevelBin(unittest.TestCase):
+    def setUp(self):
+        self.level_bin = LevelBin()
+        self.level_bin.init(*build_level_bin([
+            ('Door', 1, [
+                (PropertyType.VECTOR3, 'Base\\Position', lambda bits: [bits.write_float(v) for v in (1, 2, 3)]),
+                (PropertyType.STRING, 'Base\\Name', lambda bits: bits.write_string('door one')),
+                (PropertyType.INT, 'Base\\Count', lambda bits: bits.write(-5 & 0xFFFFFFFF, 32)),
+            ]),
+            ('Light', 2, [
+                (PropertyType.BOOL, 'Light\\On', lambda bits: bits.write(1, 1)),
+                (PropertyType.COLOR, 'Light\\Colour', lambda bits: bits.write(0x11223344, 32)),
+            ]),
+            ('Door', 3, [
+                (PropertyType.GUID, 'Base\\GUID', lambda bits: bits.write(0x0123456789abcdef, 64)),
+                (PropertyType.BBOX, 'Base\\BBox', lambda bits: [bits.write_float(v) for v in (-1, -2, -3, 4, 5, 6)]),
+                (PropertyType.FLOAT | 0x100, 'Door\\Speed', lambda bits: bits.write_float(0.5)),
+                (PropertyType.FILENAME, 'RenderInst\\File', lambda bits: bits.write_string('door.rigidgeom')),
+            ]),
+        ]))
+
+    def test_objects(self):
+        self.assertEqual([obj.type_name for obj in self.level_bin.objects], ['Door', 'Light', 'Door'])
+        self.assertEqual([obj.guid for obj in self.level_bin.objects], [1, 2, 3])
+        self.assertEqual(self.level_bin.properties[4].name, 'Light\\Colour')
+        self.assertIs(self.level_bin.properties, self.level_bin.properties)
+        self.assertIs(self.level_bin.objects, self.level_bin.objects)
+
+    def test_objects_of_type(self):
+        self.assertEqual([obj.guid for obj in self.level_bin.objects_of_type('Door')], [1, 3])
+        self.assertEqual(self.level_bin.objects_of_type('Player'), [])
+
+    def test_tables(self):
+        self.assertEqual(self.level_bin.object_table['start_property_idx'].tolist(), [0, 3, 5])
+        self.assertEqual(self.level_bin.property_table['type_index'].tolist(), [5, 11, 2, 3, 10, 9, 8, 0x101, 15])
+        self.assertEqual(self.level_bin.type_indices['Door'].tolist(), [0, 2])
+
+    def test_object_by_guid(self):
+        self.assertIs(self.level_bin.object_by_guid(2), self.level_bin.objects[1])
+        self.assertEqual(self.level_bin.object_by_guid(2).type_name, 'Light')
+        self.assertIsNone(self.level_bin.object_by_guid(99))
+
+    def test_properties_are_lazy(self):
+        door = self.level_bin.objects[2]
+        self.assertIsNone(door._properties)
+        self.assertEqual(door.properties, {
+            'Base\\GUID': 0x0123456789abcdef,
+            'Base\\BBox': [-1, -2, -3, 4, 5, 6],
+            'Door\\Speed': 0.5,
+            'RenderInst\\File': 'door.rigidgeom',
+        })
+        self.assertIsNone(self.level_bin.objects[0]._properties)
+
+    def test_properties_in_any_order(self):
+        light = self.level_bin.objects[1]
+        self.assertEqual(light.properties, {'Light\\On': True, 'Light\\Colour': 0x11223344})
+        door = self.level_bin.objects[0]
+        self.assertEqual(door.properties, {'Base\\Position': [1, 2, 3], 'Base\\Name': 'door one', 'Base\\Count': -5})
+
+    def test_decoding_leaves_bitstream(self):
+        bitpos = self.level_bin.bitstream.bitpos
+        self.level_bin.decode_properties(self.level_bin.objects[1])
+        self.assertEqual(self.level_bin.bitstream.bitpos, bitpos)
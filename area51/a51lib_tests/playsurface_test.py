@@ -0,0 +1,103 @@
+import struct
+import unittest
+
+import numpy as np
+
+from a51lib.playsurface import Playsurface, SPATIAL_CELL_DTYPE, SPATIAL_HASH_DTYPE, SPATIAL_HASH_SIZE, SURFACE_DTYPE
+
+
+def build_spatial_db(cell_size, cells):
+    """ cells is a list of ((x, y, z), first surface, number of surfaces). """
+    spatial_hash = np.zeros(SPATIAL_HASH_SIZE, dtype=SPATIAL_HASH_DTYPE)
+    spatial_hash['first_cell'] = -1
+    records = np.zeros(len(cells), dtype=SPATIAL_CELL_DTYPE)
+    for cell_no, ((x, y, z), first_surface, num_surfaces) in enumerate(cells):
+        # any hash will do, the chains are what's read
+        bucket = (x * 73 + y * 19 + z * 7) % SPATIAL_HASH_SIZE
+        records[cell_no] = ((x, y, z, b'\0\0', spatial_hash[bucket]['first_cell'], first_surface, num_surfaces, bytes(4)))
+        spatial_hash[bucket] = (cell_no, spatial_hash[bucket]['num_cells'] + 1)
+    num_surfaces = sum(num_surfaces for _, _, num_surfaces in cells)
+    return struct.pack('III', cell_size, len(cells), num_surfaces) + spatial_hash.tobytes() + records.tobytes()
+
+
+def build_playsurface(geoms, zones, cells=(), cell_size=400):
+    """ Build a playsurface. zones is a list of lists of (geom index, translation) surfaces, each a
+        unit box, and cells is as for build_spatial_db.
+    """
+    header = struct.pack('IIII', 1, len(zones), 0, len(geoms))
+    spatial_db = build_spatial_db(cell_size, cells)
+    geom_names = b''.join(name.encode('ascii').ljust(128, b'\0') for name in geoms)
+    zone_infos_size = 28 * len(zones)
+    records_offset = len(header) + len(spatial_db) + len(geom_names) + zone_infos_size
+
+    zone_infos = bytearray()
+    records = bytearray()
+    for zone in zones:
+        zone_records = np.zeros(len(zone), dtype=SURFACE_DTYPE)
+        for i, (geom_index, translation) in enumerate(zone):
+            l2w = np.eye(4, dtype=np.float32)
+            l2w[3, :3] = translation
+            zone_records[i]['l2w'] = l2w.flatten()
+            zone_records[i]['bbox'] = [*translation, 0, *(np.array(translation) + 1), 0]
+            zone_records[i]['geom_index'] = geom_index
+            zone_records[i]['render_flags'] = 0x10 + i
+        zone_infos += struct.pack('IIIIIII', 0, records_offset + len(records), len(zone), 0, 0, 0, 0)
+        records += zone_records.tobytes()
+    return header + spatial_db + geom_names + bytes(zone_infos) + bytes(records)
+
+
+class TestPlaysurface(unittest.TestCase):
+    def setUp(self):
+        self.playsurface = Playsurface()
+        self.playsurface.init(build_playsurface(['wall.rigidgeom', 'crate.rigidgeom'], [
+            [(1, (10, 0, 0)), (0, (0, 20, 0)), (1, (0, 0, 30))],
+            [],
+            [(5, (1, 2, 3))],
+        ], cells=[((0, 0, 0), 0, 2), ((-1, 2, 3), 2, 2)]))
+
+    def test_geoms(self):
+        self.assertEqual(self.playsurface.geoms, ['wall.rigidgeom', 'crate.rigidgeom'])
+
+    def test_spatial_db(self):
+        self.assertEqual(self.playsurface.cell_size, 400)
+        self.assertEqual(self.playsurface.num_spatial_surfaces, 4)
+        self.assertEqual(len(self.playsurface.spatial_hash), 1021)
+        self.assertEqual(self.playsurface.spatial_hash['num_cells'].sum(), 2)
+        cell = self.playsurface.spatial_cells[1]
+        self.assertEqual((cell['x'], cell['y'], cell['z']), (-1, 2, 3))
+        self.assertEqual((cell['next'], cell['first_surface'], cell['num_surfaces']), (-1, 2, 2))
+
+    def test_first_surface(self):
+        self.assertEqual([zone.first_surface for zone in self.playsurface.zones], [0, 3])
+
+    def test_empty_zones_are_dropped(self):
+        self.assertEqual([len(zone) for zone in self.playsurface.zones], [3, 1])
+
+    def test_columns(self):
+        zone = self.playsurface.zones[0]
+        self.assertEqual(zone.geom_index.tolist(), [1, 0, 1])
+        self.assertEqual(zone.render_flags.tolist(), [0x10, 0x11, 0x12])
+        self.assertEqual(zone.l2w.shape, (3, 16))
+        self.assertEqual(zone.bboxes[1].tolist(), [0, 20, 0, 0, 1, 21, 1, 0])
+        self.assertEqual(zone.geom_names(), ['wall.rigidgeom', 'crate.rigidgeom'])
+        self.assertEqual(zone.geom_names(np.array([0, 2])), ['crate.rigidgeom'])
+
+    def test_surfaces(self):
+        surface = self.playsurface.zones[0].surfaces[2]
+        self.assertEqual(surface.geom_name, 'crate.rigidgeom')
+        self.assertEqual(surface.l2w[12:15], (0.0, 0.0, 30.0))
+        self.assertEqual(surface.bounding_box.max_z, 31.0)
+        self.assertIs(self.playsurface.zones[0].surfaces[2], surface)
+
+    def test_empty_zone_offset_past_end(self):
+        data = bytearray(build_playsurface(['wall.rigidgeom'], [[], [(0, (0, 0, 0))]]))
+        zone_info_offset = 16 + 12 + 8 * 1021 + 128
+        struct.pack_into('I', data, zone_info_offset + 4, len(data) + 100)
+        playsurface = Playsurface()
+        playsurface.init(bytes(data))
+        self.assertEqual([len(zone) for zone in playsurface.zones], [1])
+
+    def test_missing_geom(self):
+        zone = self.playsurface.zones[1]
+        self.assertEqual(zone.surfaces[0].geom_name, '')
+        self.assertEqual(zone.geom_names(), [])
@@ -0,0 +1,186 @@
+import os
+import pickle
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from a51lib.dfs import Dfs
+from a51lib.dfs_pool import dfs_process_pool
+from a51lib.geom_cache import GeomCache
+from a51lib.inev_file import InevFile
+from a51lib.rigid_geom_loader import load_rigid_geoms
+from a51lib.rigid_geom import RigidGeom, RIGID_VERTEX_DTYPE
+from a51lib_tests.dfs_test import write_dfs
+
+STRINGS = b'wall.xbmp\0wall texture\0crate\0'
+
+
+def build_rigid_geom(dlists):
+    """ Build a PC rigidgeom INEV file with one mesh and one submesh per (indices, vertex_data) dlist. """
+    static = bytearray(240)
+    refs = []
+
+    def add_array(pointer_offset, data, count):
+        static.extend(b'\0' * (-len(static) % 16))
+        refs.append((pointer_offset, count, len(static), 3))
+        static.extend(data)
+
+    num_dlists = len(dlists)
+    struct.pack_into('8f', static, 0, -1, -2, -3, 0, 1, 2, 3, 0)
+    # platform, pad, version, faces, verts, bones, bone masks, property sections, properties,
+    # rigid bodies, meshes, submeshes, materials, textures, uv keys, lods, virtual meshes,
+    # virtual materials, virtual textures, string data size
+    struct.pack_into('20h', static, 32, 1, 0, 41, 0, 0, 0, 0, 0, 0, 0,
+                     1, num_dlists, 1, 1, 0, 0, 0, 0, 0, len(STRINGS))
+    struct.pack_into('i', static, 224, num_dlists)
+
+    mesh = struct.pack('8f', -1, -2, -3, 0, 1, 2, 3, 0) + struct.pack('6h', 23, num_dlists, 0, 0, 0, 0) + bytes(4)
+    add_array(92, mesh, 1)
+    add_array(96, b''.join(struct.pack('HHf', i, 0, 1.0) + bytes(4) for i in range(num_dlists)), num_dlists)
+    add_array(100, bytes(8) + struct.pack('ffHBBB', 1.0, 1.0, 0, 0, 1, 0) + bytes(3), 1)
+    add_array(104, struct.pack('hh', 10, 0), 1)
+    add_array(132, STRINGS, len(STRINGS))
+
+    static.extend(b'\0' * (-len(static) % 16))
+    dlist_array_offset = len(static)
+    add_array(228, bytes(24 * num_dlists), num_dlists)
+    for dlist_no, (indices, vertex_data) in enumerate(dlists):
+        record = dlist_array_offset + dlist_no * 24
+        struct.pack_into('IiiiI', static, record, len(indices), 0, len(vertex_data), 0, dlist_no)
+        add_array(record + 4, np.asarray(indices, dtype='<u2').tobytes(), len(indices))
+        add_array(record + 12, vertex_data.tobytes(), len(vertex_data))
+
+    static.extend(b'\0' * (-len(static) % 16))
+    for ref in refs:
+        static.extend(struct.pack('<iiiI', *ref))
+    return struct.pack('Iiiii', 0x56656e49, 1, len(static), len(refs), 0) + bytes(static)
+
+
+def make_vertices(count):
+    vertex_data = np.zeros(count, dtype=RIGID_VERTEX_DTYPE)
+    vertex_data['position'] = np.arange(count * 3).reshape(count, 3)
+    vertex_data['normal'] = [0.0, 1.0, 0.0]
+    vertex_data['colour'] = [1, 2, 3, 4]
+    vertex_data['uv'] = np.arange(count * 2).reshape(count, 2) / 10
+    return vertex_data
+
+
+class TestRigidGeom(unittest.TestCase):
+    def setUp(self):
+        self.vertex_data = make_vertices(4)
+        self.data = build_rigid_geom([([0, 1, 2, 2, 1, 3], self.vertex_data), ([3, 2, 1], make_vertices(5))])
+
+    def test_read(self):
+        geom = RigidGeom()
+        geom.read(self.data)
+        self.assertTrue(geom.is_valid())
+        self.assertEqual(geom.geom.meshes[0].name, 'crate')
+        self.assertEqual(geom.geom.textures[0].filename, 'wall.xbmp')
+        self.assertEqual(len(geom.dlists), 2)
+        dlist = geom.dlists[0]
+        self.assertEqual(dlist.indices.tolist(), [0, 1, 2, 2, 1, 3])
+        np.testing.assert_array_equal(dlist.positions, self.vertex_data['position'])
+        np.testing.assert_array_equal(dlist.uvs, self.vertex_data['uv'])
+        self.assertEqual(dlist.colours.tolist(), [[1, 2, 3, 4]] * 4)
+        self.assertEqual(geom.dlists[1].bone_index, 1)
+
+    def test_data_size(self):
+        geom = RigidGeom()
+        geom.read(self.data)
+        self.assertEqual(geom.data_size(), 9 * RIGID_VERTEX_DTYPE.itemsize + 9 * 2)
+
+    def test_read_memoryview(self):
+        geom = RigidGeom()
+        geom.read(memoryview(self.data))
+        self.assertTrue(geom.is_valid())
+        self.assertEqual(len(geom.dlists[1].positions), 5)
+
+    def test_vertices_view(self):
+        geom = RigidGeom()
+        geom.read(self.data)
+        vertex = geom.dlists[0].vertices[3]
+        self.assertEqual(vertex.position, [9.0, 10.0, 11.0])
+        self.assertEqual(vertex.colour, [1, 2, 3, 4])
+        self.assertAlmostEqual(vertex.uv[1], 0.7)
+
+    def test_resolve_all(self):
+        inev_file = InevFile(self.data)
+        targets = inev_file.resolve_all()
+        self.assertEqual(len(targets), inev_file.num_tables)
+        # the string table
+        self.assertEqual(bytes(self.data[targets[132]:targets[132] + 5]), b'wall.')
+        self.assertEqual(inev_file.diagnostics, [])
+
+    def test_count_mismatch_diagnostic(self):
+        data = bytearray(self.data)
+        inev_file = InevFile(data)
+        # the first ref is the mesh array, claim it has 2 meshes
+        struct.pack_into('i', data, inev_file.resolve_table_offset + 4, 2)
+        geom = RigidGeom()
+        geom.read(data)
+        self.assertTrue(geom.is_valid())
+        self.assertEqual(len(geom.geom.diagnostics), 1)
+        self.assertEqual(geom.geom.diagnostics[0].source, 92)
+        self.assertIn('Expected count to be 1, but saw 2', geom.geom.diagnostics[0].message)
+
+    def test_pickle(self):
+        geom = RigidGeom()
+        geom.read(memoryview(self.data))
+        geom.dlists[0].vertices
+        copy = pickle.loads(pickle.dumps(geom))
+        self.assertIsNone(copy.dlists[0]._vertices)
+        np.testing.assert_array_equal(copy.dlists[1].vertex_data, geom.dlists[1].vertex_data)
+        self.assertEqual(copy.geom.textures[0].filename, 'wall.xbmp')
+
+
+class TestLoadRigidGeoms(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp_dir.name, 'RESOURCE')
+        write_dfs(self.base, [
+            ('crate', '.rigidgeom', build_rigid_geom([([0, 1, 2], make_vertices(3))])),
+            ('bad', '.rigidgeom', bytes(32)),
+            ('wall', '.rigidgeom', build_rigid_geom([([0, 1, 2, 1, 2, 3], make_vertices(4)), ([0, 1, 2], make_vertices(3))])),
+        ], split_size=256)
+        self.dfs = Dfs()
+        self.dfs.open(self.base)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_serial_and_parallel_match(self):
+        names = ['wall.rigidgeom', 'crate.rigidgeom', 'bad.rigidgeom', 'missing.rigidgeom', 'wall.rigidgeom']
+        serial = load_rigid_geoms(self.dfs, names)
+        parallel = load_rigid_geoms(self.dfs, names, workers=2)
+        self.assertEqual(list(serial), ['wall.rigidgeom', 'crate.rigidgeom'])
+        self.assertEqual(list(parallel), list(serial))
+        for name, geom in serial.items():
+            np.testing.assert_array_equal(parallel[name].dlists[0].indices, geom.dlists[0].indices)
+            np.testing.assert_array_equal(parallel[name].dlists[0].vertex_data, geom.dlists[0].vertex_data)
+
+    def test_shared_pool(self):
+        with dfs_process_pool(self.dfs, 2) as pool:
+            first = load_rigid_geoms(self.dfs, ['wall.rigidgeom'], pool=pool)
+            second = load_rigid_geoms(self.dfs, ['crate.rigidgeom', 'bad.rigidgeom'], pool=pool)
+        self.assertEqual(list(first), ['wall.rigidgeom'])
+        self.assertEqual(list(second), ['crate.rigidgeom'])
+
+    def test_cache(self):
+        cache = GeomCache(os.path.join(self.tmp_dir.name, 'cache'))
+        names = ['wall.rigidgeom', 'crate.rigidgeom']
+        parsed = load_rigid_geoms(self.dfs, names, cache=cache)
+        cached = cache.load(self.dfs, 'wall.rigidgeom')
+        # one array for every dlist, read without keeping the file open
+        self.assertIs(cached.dlists[0].vertex_data.base, cached.dlists[1].vertex_data.base)
+        self.assertNotIsInstance(cached.dlists[0].vertex_data.base, np.memmap)
+        self.assertTrue(cached.is_valid())
+        self.assertEqual(cached.geom.textures[0].filename, 'wall.xbmp')
+        self.assertEqual(cached.geom.meshes[0].name, 'crate')
+        self.assertEqual(cached.geom.lookup_string(0), 'wall.xbmp')
+        self.assertEqual(cached.geom.platform, 1)
+        np.testing.assert_array_equal(cached.dlists[0].indices, parsed['wall.rigidgeom'].dlists[0].indices)
+        np.testing.assert_array_equal(cached.dlists[0].vertex_data, parsed['wall.rigidgeom'].dlists[0].vertex_data)
+        self.assertEqual(list(load_rigid_geoms(self.dfs, names, cache=cache)), names)
+        self.assertIsNone(cache.load(self.dfs, 'bad.rigidgeom'))
@@ -0,0 +1,84 @@
+import struct
+import unittest
+
+import numpy as np
+
+from a51lib.playsurface import Playsurface
+from a51lib.spatial_index import SpatialIndex
+from a51lib_tests.playsurface_test import build_playsurface
+
+
+def build_indexed_playsurface(geoms, surfaces, zone_sizes, cell_size):
+    """ Put each (geom index, translation) surface in the cell of its box's centre, as the game's
+        spatial database does, then split them into zones of zone_sizes surfaces.
+    """
+    def cell_of(translation):
+        return tuple(int(c) for c in np.floor((np.array(translation) + 0.5) / cell_size))
+
+    surfaces = sorted(surfaces, key=lambda surface: cell_of(surface[1]))
+    cells = []
+    for surface_no, (_, translation) in enumerate(surfaces):
+        cell = cell_of(translation)
+        if cells and cells[-1][0] == cell:
+            cells[-1] = (cell, cells[-1][1], cells[-1][2] + 1)
+        else:
+            cells.append((cell, surface_no, 1))
+    zones = []
+    for size in zone_sizes:
+        zones.append(surfaces[:size])
+        surfaces = surfaces[size:]
+    playsurface = Playsurface()
+    playsurface.init(build_playsurface(geoms, zones, cells, cell_size))
+    return playsurface
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        # unit boxes at the given corners, the cells are 400 wide
+        self.playsurface = build_indexed_playsurface(['wall.rigidgeom', 'crate.rigidgeom'], [
+            (0, (10, 0, 0)), (1, (1000, 0, 0)), (0, (-500, 399.5, 0)), (1, (10.5, 0.5, 0.5)),
+        ], [2, 0, 2], 400)
+        self.index = SpatialIndex(self.playsurface)
+
+    def test_cells(self):
+        self.assertEqual(sorted(self.index.cells), [(-2, 1, 0), (0, 0, 0), (2, 0, 0)])
+        self.assertEqual(self.index.reach, 1)
+
+    def test_query_point(self):
+        # the surfaces were sorted by cell, so are (-500, 399.5, 0), (10, 0, 0) | (10.5, 0.5, 0.5), (1000, 0, 0)
+        self.assertEqual(self.index.query_point_ids((10.75, 0.75, 0.75)).tolist(), [[0, 1], [1, 0]])
+        self.assertEqual(self.index.query_point_ids((5, 0, 0)).tolist(), [])
+        surfaces = self.index.query_point((1000.5, 0.5, 0.5))
+        self.assertEqual([surface.geom_name for surface in surfaces], ['crate.rigidgeom'])
+
+    def test_query_aabb(self):
+        self.assertEqual(self.index.query_aabb_ids((0, 0, 0), (20, 20, 20)).tolist(), [[0, 1], [1, 0]])
+        # in the cell below the one which lists it
+        self.assertEqual(self.index.query_aabb_ids((-500, 399.6, 0), (-499, 399.9, 1)).tolist(), [[0, 0]])
+        self.assertEqual(len(self.index.query_aabb((-1e6, -1e6, -1e6), (1e6, 1e6, 1e6))), 4)
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(19)
+        surfaces = [(int(rng.integers(2)), tuple(rng.uniform(-10, 10, 3).tolist())) for _ in range(300)]
+        playsurface = build_indexed_playsurface(['wall.rigidgeom', 'crate.rigidgeom'], surfaces, [100, 0, 120, 80], 2)
+        index = SpatialIndex(playsurface)
+        zones = playsurface.zones
+        ids = np.concatenate([[(zone_no, surf_no) for surf_no in range(len(zone))] for zone_no, zone in enumerate(zones)])
+        bboxes = np.concatenate([zone.bboxes for zone in zones])
+
+        for _ in range(200):
+            corners = rng.uniform(-12, 12, (2, 3))
+            bbox_min, bbox_max = corners.min(axis=0), corners.max(axis=0)
+            if rng.integers(4) == 0:
+                bbox_max = bbox_min
+            expected = ids[np.all((bboxes[:, 0:3] <= bbox_max) & (bboxes[:, 4:7] >= bbox_min), axis=1)]
+            self.assertEqual(index.query_aabb_ids(bbox_min, bbox_max).tolist(), expected.tolist())
+
+    def test_broken_chain(self):
+        data = bytearray(build_playsurface(['wall.rigidgeom'], [[(0, (0, 0, 0))]], [((0, 0, 0), 0, 1)]))
+        # point the cell's next at itself
+        struct.pack_into('i', data, 16 + 12 + 8 * 1021 + 8, 0)
+        playsurface = Playsurface()
+        playsurface.init(bytes(data))
+        with self.assertRaises(ValueError):
+            SpatialIndex(playsurface)
@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from a51lib.vecmath import BoundingBox, Matrix4x4, aabb_reduce_by_group, aabb_transform, aabb_union, aabbs_from_bboxes
+
+
+class TestMatrix4x4(unittest.TestCase):
+    def setUp(self):
+        self.mtx = Matrix4x4()
+        self.mtx.translate([1.0, 2.0, 3.0])
+        self.mtx.scale(0.5)
+        self.mtx.convert_zup_to_yup()
+
+    def test_transform_points_matches_transform(self):
+        points = np.array([[0.0, 0.0, 0.0], [1.0, -2.0, 3.5], [10.0, 20.0, 30.0]])
+        expected = [self.mtx.transform(*point) for point in points]
+        np.testing.assert_allclose(self.mtx.transform_points(points), expected)
+
+    def test_from_column_major(self):
+        # translation lives in the last column, i.e. the last 4 floats of a column major matrix
+        l2w = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 5, 6, 7, 1]
+        mtx = Matrix4x4.from_column_major(l2w)
+        self.assertEqual(mtx.transform(1, 1, 1), (6, 7, 8))
+
+    def test_multiply_applies_right_hand_side_first(self):
+        l2w = Matrix4x4.from_column_major([1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 5, 6, 7, 1])
+        combined = self.mtx.multiply(l2w)
+        np.testing.assert_allclose(combined.transform(1, 1, 1), self.mtx.transform(6, 7, 8))
+
+    def test_from_pos_rot(self):
+        # a quarter turn of yaw takes x to -z
+        mtx = Matrix4x4.from_pos_rot([1, 2, 3], [0, np.pi / 2, 0])
+        np.testing.assert_allclose(mtx.transform(1, 0, 0), (1, 2, 2), atol=1e-12)
+        np.testing.assert_allclose(Matrix4x4.from_column_major(mtx.to_column_major()).m4, mtx.m4)
+
+
+class TestAabb(unittest.TestCase):
+    def setUp(self):
+        self.aabbs = np.array([[0, 0, 0, 1, 1, 1], [-2, 3, 0, -1, 4, 5], [5, 5, 5, 6, 6, 6]], dtype=float)
+
+    def test_from_bboxes(self):
+        bboxes = np.array([[1, 2, 3, 0, 4, 5, 6, 0]], dtype=np.float32)
+        self.assertEqual(aabbs_from_bboxes(bboxes).tolist(), [[1, 2, 3, 4, 5, 6]])
+
+    def test_union(self):
+        self.assertEqual(aabb_union(self.aabbs).tolist(), [-2, 0, 0, 6, 6, 6])
+
+    def test_transform_rotation(self):
+        # 45 degrees about z, a unit box's corners reach out to sqrt(2) / 2 from the centre
+        c = s = np.sqrt(0.5)
+        mtx = Matrix4x4()
+        mtx.m4 = np.array([[c, -s, 0, 0], [s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+        aabb = aabb_transform([-0.5, -0.5, -0.5, 0.5, 0.5, 0.5], mtx)
+        np.testing.assert_allclose(aabb, [-c, -c, -0.5, c, c, 0.5])
+        box = BoundingBox([-0.5, -0.5, -0.5, 0.5, 0.5, 0.5]).transform(mtx)
+        np.testing.assert_allclose(box.to_aabb(), aabb)
+
+    def test_transform_batch(self):
+        mtx = Matrix4x4()
+        mtx.translate([1, 2, 3])
+        np.testing.assert_allclose(aabb_transform(self.aabbs, mtx), self.aabbs + [1, 2, 3, 1, 2, 3])
+
+    def test_reduce_by_group(self):
+        reduced = aabb_reduce_by_group(self.aabbs, [1, 0, 1], num_groups=3)
+        self.assertEqual(reduced[0].tolist(), [-2, 3, 0, -1, 4, 5])
+        self.assertEqual(reduced[1].tolist(), [0, 0, 0, 6, 6, 6])
+        self.assertTrue(np.all(np.isinf(reduced[2])))
@@ -0,0 +1,113 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+import png
+
+from a51lib.xbmp import XBmp, XBmpFormat
+
+
+def build_xbmp(pixel_data, width, height, physical_width, fmt, clut_data=b'', num_mips=0):
+    header = struct.pack('iiiiiIii', len(pixel_data), len(clut_data), width, height,
+                         physical_width, 0, num_mips, fmt)
+    return header + pixel_data + clut_data
+
+
+class TestXBmp(unittest.TestCase):
+    def setUp(self):
+        # 2x2 image with a physical width of 3, stored BGRA
+        rows = [[(1, 2, 3, 4), (5, 6, 7, 8), (99, 99, 99, 99)],
+                [(9, 10, 11, 12), (13, 14, 15, 16), (99, 99, 99, 99)]]
+        pixel_data = bytes(c for row in rows for pixel in row for c in pixel)
+        self.xbmp = XBmp()
+        self.xbmp.read(build_xbmp(pixel_data, 2, 2, 3, XBmpFormat.FMT_ARGB_8888))
+
+    def test_to_rgba_array(self):
+        rgba = self.xbmp.to_rgba_array()
+        self.assertEqual(rgba.shape, (2, 2, 4))
+        self.assertEqual(rgba.tolist(), [[[3, 2, 1, 4], [7, 6, 5, 8]],
+                                         [[11, 10, 9, 12], [15, 14, 13, 16]]])
+
+    def test_write_png(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'test.png')
+            self.xbmp.write_png(filename)
+            with open(filename, 'rb') as file:
+                width, height, rows, info = png.Reader(file=file).read()
+                self.assertEqual((width, height), (2, 2))
+                self.assertTrue(info['alpha'])
+                np.testing.assert_array_equal(np.array([list(row) for row in rows]).reshape(2, 2, 4),
+                                              self.xbmp.to_rgba_array())
+
+    def test_16_bit(self):
+        # red, green, blue, white as RGB_565
+        pixel_data = struct.pack('<4H', 0xf800, 0x07e0, 0x001f, 0xffff)
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(pixel_data, 2, 2, 2, XBmpFormat.FMT_RGB_565))
+        self.assertEqual(xbmp.to_rgba_array().reshape(4, 4).tolist(),
+                         [[255, 0, 0, 255], [0, 255, 0, 255], [0, 0, 255, 255], [255, 255, 255, 255]])
+
+    def test_argb_1555(self):
+        pixel_data = struct.pack('<2H', 0x7c00, 0x801f)
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(pixel_data, 2, 1, 2, XBmpFormat.FMT_ARGB_1555))
+        self.assertEqual(xbmp.to_rgba_array().reshape(2, 4).tolist(), [[255, 0, 0, 0], [0, 0, 255, 255]])
+
+    def test_palette_8_bit(self):
+        clut = bytes([10, 20, 30, 40, 50, 60, 70, 80])   # two BGRA entries
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(bytes([1, 0, 0, 1]), 2, 2, 2, XBmpFormat.FMT_P8_ARGB_8888, clut))
+        self.assertEqual(xbmp.to_rgba_array().reshape(4, 4).tolist(),
+                         [[70, 60, 50, 80], [30, 20, 10, 40], [30, 20, 10, 40], [70, 60, 50, 80]])
+
+    def test_palette_4_bit(self):
+        clut = bytes([10, 20, 30, 40, 50, 60, 70, 80])
+        xbmp = XBmp()
+        # low nibble first
+        xbmp.read(build_xbmp(bytes([0x01, 0x10]), 2, 2, 2, XBmpFormat.FMT_P4_ARGB_8888, clut))
+        self.assertEqual(xbmp.to_rgba_array()[:, :, 0].tolist(), [[70, 30], [30, 70]])
+
+    def test_dxt1(self):
+        # colour 0 red, colour 1 blue, rows use indices 0, 1, 2, 3
+        block = struct.pack('<HHI', 0xf800, 0x001f, 0b11100100_11100100_11100100_11100100)
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(block, 4, 4, 4, XBmpFormat.FMT_DXT1))
+        rgba = xbmp.to_rgba_array()
+        self.assertEqual(rgba.shape, (4, 4, 4))
+        self.assertEqual(rgba[0].tolist(), [[255, 0, 0, 255], [0, 0, 255, 255],
+                                            [170, 0, 85, 255], [85, 0, 170, 255]])
+        np.testing.assert_array_equal(rgba[3], rgba[0])
+
+    def test_dxt5_alpha(self):
+        # alpha 255 -> 0 with 8 steps, every pixel uses index 1 (alpha 0) apart from the first (index 0)
+        alpha_bits = sum(1 << (3 * i) for i in range(1, 16))
+        alpha = struct.pack('<BB', 255, 0) + alpha_bits.to_bytes(6, 'little')
+        colour = struct.pack('<HHI', 0xffff, 0xffff, 0)
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(alpha + colour, 4, 4, 4, XBmpFormat.FMT_DXT5))
+        alphas = xbmp.to_rgba_array()[..., 3]
+        self.assertEqual(alphas[0].tolist(), [255, 0, 0, 0])
+        self.assertEqual(int(alphas.sum()), 255)
+
+    def test_mip_levels(self):
+        # 4x4 + 2x2 + 1x1 32 bit levels, one after another
+        levels = [bytes([i, i, i, 255]) * (n * n) for i, n in ((1, 4), (2, 2), (3, 1))]
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(b''.join(levels), 4, 4, 4, XBmpFormat.FMT_ARGB_8888, num_mips=2))
+        self.assertEqual([level[1:3] for level in xbmp.mip_levels()], [(4, 4), (2, 2), (1, 1)])
+        self.assertEqual(xbmp.to_rgba_array(1).shape, (2, 2, 4))
+        self.assertEqual(xbmp.to_rgba_array(2).tolist(), [[[3, 3, 3, 255]]])
+
+    def test_unsupported_format(self):
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(bytes(4), 1, 1, 1, 1000))
+        with self.assertRaises(ValueError):
+            xbmp.to_rgba_array()
+
+    def test_null_format(self):
+        xbmp = XBmp()
+        xbmp.read(build_xbmp(bytes(4), 1, 1, 1, XBmpFormat.FMT_NULL))
+        with self.assertRaisesRegex(ValueError, 'no pixel format'):
+            xbmp.to_rgba_array()
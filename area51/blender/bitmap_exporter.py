@@ -1,29 +1,157 @@
 
+import hashlib
+import json
 import os
+from concurrent.futures import as_completed
+from typing import Callable
+
 from a51lib.dfs import Dfs
-from a51lib.xbmp import XBmp
+from a51lib.dfs_pool import dfs_process_pool
+from a51lib.xbmp_export import export_bitmap, export_bitmap_worker
+
+
+# Records what every exported PNG was made from, see export_bitmaps
+MANIFEST_FILENAME = 'xbmp_manifest.json'
+# Bump when the PNGs written for the same bitmap change, so that they are all rewritten
+MANIFEST_VERSION = 1
+
+def load_manifest(output_path: str) -> dict:
+    """ Load the export manifest from output_path, or an empty one. """
+    try:
+        with open(os.path.join(output_path, MANIFEST_FILENAME), 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('version', MANIFEST_VERSION)
+    manifest.setdefault('textures', {})
+    return manifest
+
+def save_manifest(output_path: str, manifest: dict):
+    filename = os.path.join(output_path, MANIFEST_FILENAME)
+    with open(filename + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+
+def png_filename(output_path: str, xbmp_file: str) -> str:
+    """ The PNG a bitmap in the DFS is exported to. """
+    base_name = os.path.splitext(os.path.basename(xbmp_file))[0].casefold().strip()
+    return os.path.join(output_path, f"{base_name}.png").replace('[', '_').replace(']', '_')
+
+def texture_png_basename(texture_filename: str) -> str:
+    """ The PNG basename (without extension) a geom's texture filename refers to. """
+    return texture_filename.split('.')[0].casefold().replace('[', '_').replace(']', '_').strip()
 
+def find_xbmp_files(resource_dfs: Dfs, texture_filenames) -> list[str]:
+    """ The bitmaps in the DFS which are exported to the PNGs the given geom texture filenames refer to. """
+    wanted = {texture_png_basename(filename) for filename in texture_filenames}
+    xbmp_files = []
+    for xbmp_file in resource_dfs.get_filenames('.xbmp'):
+        png_basename = os.path.splitext(os.path.basename(png_filename('', xbmp_file)))[0]
+        if png_basename in wanted:
+            xbmp_files.append(xbmp_file)
+    return xbmp_files
 
-def export_bitmaps(resource_dfs: Dfs, output_path: str):
+def _users(record: dict) -> list[str]:
+    """ The DFS files using a manifest record's PNG. Older records only name the DFS which wrote it. """
+    if 'users' in record:
+        return list(record['users'])
+    return [record['dfs']] if 'dfs' in record else []
+
+def export_bitmaps(resource_dfs: Dfs, output_path: str, workers: int = 1,
+                   progress: Callable[[int, int, str], None] = None, incremental: bool = True,
+                   xbmp_files: list[str] = None) -> dict[str, str]:
     """
     Export bitmaps from the given DFS to the specified output path.
+
+    When incremental, a manifest in output_path records the DFS entry (offset, length and content hash)
+    each PNG was last made from, and every DFS whose export uses it. Bitmaps whose PNG is already up to
+    date are skipped. PNGs which this DFS no longer exports stop being used by it, and are only deleted
+    once no DFS uses them, as levels can share an output path.
     
     :param resource_dfs: DFS file containing resource data.
     :param output_path: Path to export the bitmaps.
+    :param workers: Number of processes to decode and encode with. 1 exports in this process.
+    :param progress: Optional callback, called with (number done, total, xbmp filename) after each bitmap written.
+    :param incremental: Skip unchanged bitmaps and prune stale PNGs.
+    :param xbmp_files: The bitmaps to export, see find_xbmp_files. Defaults to every bitmap in the DFS.
+    :return: The bitmaps which failed to export, mapped to the error.
     """
 
     os.makedirs(output_path, exist_ok=True)
     
-    xbmp_files = resource_dfs.get_filenames('.xbmp')
+    if xbmp_files is None:
+        xbmp_files = resource_dfs.get_filenames('.xbmp')
+    failures = {}
+
+    manifest = load_manifest(output_path) if incremental else {'version': MANIFEST_VERSION, 'textures': {}}
+    textures = manifest['textures']
+    up_to_date_version = manifest['version'] == MANIFEST_VERSION
+    dfs_name = os.path.abspath(resource_dfs.base_filename)
+
+    exported = {}
+    to_export = []
     for xbmp_file in xbmp_files:
-        xbmp_data = resource_dfs.get_file(xbmp_file)
-        xbmp = XBmp()
-        xbmp.read(xbmp_data)
-        
-        # Construct the output filename
-        base_name = os.path.splitext(os.path.basename(xbmp_file))[0].casefold().strip()
-        output_filename = os.path.join(output_path, f"{base_name}.png").replace('[', '_').replace(']', '_')
-        
-        # Write the bitmap to a PNG file
-        xbmp.write_png(output_filename)
-        
\ No newline at end of file
+        output_filename = png_filename(output_path, xbmp_file)
+        if incremental:
+            entry = resource_dfs.get_entry(xbmp_file)
+            record = {
+                'dfs': dfs_name,
+                'source': xbmp_file,
+                'offset': entry['data_offset'],
+                'length': entry['data_length'],
+                'hash': hashlib.sha1(resource_dfs.get_file(xbmp_file)).hexdigest(),
+            }
+            key = os.path.basename(output_filename)
+            exported[key] = record
+            stored = textures.get(key, {})
+            if up_to_date_version and stored.get('hash') == record['hash'] and os.path.exists(output_filename):
+                continue
+        to_export.append((xbmp_file, output_filename))
+
+    def finished(num_done, xbmp_file, error):
+        if error is not None:
+            print(f'Failed to export {xbmp_file}: {error}')
+            failures[xbmp_file] = error
+        if progress is not None:
+            progress(num_done, len(to_export), xbmp_file)
+
+    if workers <= 1:
+        for num_done, (xbmp_file, output_filename) in enumerate(to_export, 1):
+            error = export_bitmap(resource_dfs.get_file(xbmp_file), output_filename)
+            finished(num_done, xbmp_file, error)
+    else:
+        with dfs_process_pool(resource_dfs, workers) as pool:
+            futures = {}
+            for xbmp_file, output_filename in to_export:
+                entry = resource_dfs.get_entry(xbmp_file)
+                future = pool.submit(export_bitmap_worker, entry['data_offset'], entry['data_length'],
+                                     output_filename)
+                futures[future] = xbmp_file
+            for num_done, future in enumerate(as_completed(futures), 1):
+                finished(num_done, futures[future], future.result())
+
+    if incremental:
+        # This DFS no longer uses what it exported last time but not this time.
+        for key, stored in list(textures.items()):
+            if key in exported:
+                continue
+            users = [user for user in _users(stored) if user != dfs_name]
+            if users:
+                stored['users'] = users
+            else:
+                stale_filename = os.path.join(output_path, key)
+                if os.path.exists(stale_filename):
+                    os.remove(stale_filename)
+                del textures[key]
+        for key, record in exported.items():
+            if record['source'] in failures:
+                # retry next time
+                textures.pop(key, None)
+            else:
+                users = _users(textures.get(key, {}))
+                if dfs_name not in users:
+                    users.append(dfs_name)
+                textures[key] = dict(record, users=users)
+        manifest['version'] = MANIFEST_VERSION
+        save_manifest(output_path, manifest)
+    return failures
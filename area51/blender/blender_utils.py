@@ -1,5 +1,6 @@
 import bpy
 import bmesh
+import numpy as np
 
 # ref https://modwiki.dhewm3.org/RBDoom3BFG-Blender-Mapping
 
@@ -43,6 +44,29 @@ def remove_mesh(mesh_name: str):
         print(f"Mesh '{mesh_name}' not found in Blender data."
               )
 
+def fill_mesh(mesh, co: np.ndarray, loop_vertex_index: np.ndarray, loop_start: np.ndarray, uvs: np.ndarray = None):
+    """
+    Fill an empty mesh from flat arrays using foreach_set rather than from_pydata,
+    so that no per vertex Python objects are created.
+
+    :param mesh: The (empty) mesh to fill.
+    :param co: (N, 3) array of vertex positions.
+    :param loop_vertex_index: The vertex index of every loop (face corner).
+    :param loop_start: The first loop of every face. Each face runs up to the next one's start.
+    :param uvs: Optional (num loops, 2) array of per loop uvs.
+    """
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set('co', np.ascontiguousarray(co, dtype=np.float32).ravel())
+    mesh.loops.add(len(loop_vertex_index))
+    mesh.loops.foreach_set('vertex_index', np.ascontiguousarray(loop_vertex_index, dtype=np.int32))
+    mesh.polygons.add(len(loop_start))
+    # loop_total is read-only since Blender 4, it is derived from loop_start
+    mesh.polygons.foreach_set('loop_start', np.ascontiguousarray(loop_start, dtype=np.int32))
+    if uvs is not None:
+        uv_layer = mesh.uv_layers.new()
+        uv_layer.data.foreach_set('uv', np.ascontiguousarray(uvs, dtype=np.float32).ravel())
+    mesh.update(calc_edges=True)
+
 def recurLayerCollection(layerColl, collName):
     found = None
     if (layerColl.name == collName):
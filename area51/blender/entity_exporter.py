@@ -0,0 +1,69 @@
+import bpy
+from typing import Callable
+
+from a51lib.level_bin import LevelBin, LevelObject
+from a51lib.vecmath import Matrix4x4
+
+# level object type name -> function(level_exporter, type_name, objects, collection) which exports them
+ENTITY_EXPORTERS: dict[str, Callable] = {}
+
+def entity_exporter(*type_names: str):
+    """ Register the decorated function as the exporter for the given level object types. """
+    def register(func):
+        for type_name in type_names:
+            ENTITY_EXPORTERS[type_name] = func
+        return func
+    return register
+
+def render_inst_file(obj: LevelObject) -> str | None:
+    return obj.properties.get('RenderInst\\File')
+
+def entity_l2w(obj: LevelObject) -> list[float]:
+    """ The object's local to world matrix, column major like playsurface matrices. """
+    pos = obj.properties.get('Base\\Position', [0.0, 0.0, 0.0])
+    rot = obj.properties.get('Base\\Rotation', [0.0, 0.0, 0.0])
+    return Matrix4x4.from_pos_rot(pos, rot).to_column_major()
+
+def entity_geom_names(level_bin: LevelBin) -> list[str]:
+    """ The rigid geoms used by objects which have an exporter, so they can be loaded with everything else. """
+    geom_names = []
+    for type_name in ENTITY_EXPORTERS:
+        for obj in level_bin.objects_of_type(type_name):
+            geom_name = render_inst_file(obj)
+            if geom_name:
+                geom_names.append(geom_name)
+    return list(dict.fromkeys(geom_names))
+
+@entity_exporter('Door', 'Anim Surface', 'Invisible Wall')
+def export_render_inst_entities(level_exporter, type_name: str, objects: list[LevelObject], col):
+    """ Place each object's RenderInst geom. Every placement of a geom shares its meshes. """
+    # Example Door properties:
+    #
+    # Base\Position = [-1700.0, 0.0, -3150.0]
+    # Base\Rotation = [0.0, 1.5707964897155762, 0.0]
+    # RenderInst\File = AH_HangarDoor_4x4m_000_bindpose.rigidgeom
+    # Door\Initial State = CLOSED
+    # Door\Resting State = CLOSED
+    name_prefix = type_name.lower().replace(' ', '_')
+    for obj_no, obj in enumerate(objects):
+        geom_name = render_inst_file(obj)
+        geom = level_exporter.rigid_geoms.get(geom_name) if geom_name else None
+        if geom is None:
+            # missing geoms were reported when loading
+            continue
+        blender_objects = level_exporter.export_geom(geom, geom_name, entity_l2w(obj), None, None, col,
+                                                     name_prefix + str(obj_no + 1), bake=False)
+        for blender_object in blender_objects:
+            blender_object["a51_type"] = type_name
+            # too big for an int property
+            blender_object["a51_guid"] = f'{obj.guid:016x}'
+
+def export_entities(level_exporter, level_bin: LevelBin, parent_col):
+    """ Export the objects of every type which has an exporter, each type into its own collection. """
+    for type_name, exporter in ENTITY_EXPORTERS.items():
+        objects = level_bin.objects_of_type(type_name)
+        if not objects:
+            continue
+        col = bpy.data.collections.new(type_name)
+        parent_col.children.link(col)
+        exporter(level_exporter, type_name, objects, col)
@@ -3,45 +3,47 @@ import os
 
 import numpy as np
 
-from a51lib.vecmath import Matrix4x4
-from .bitmap_exporter import export_bitmaps
+from a51lib.vecmath import BoundingBox, Matrix4x4, aabb_transform, aabb_union, aabbs_from_bboxes
+from .bitmap_exporter import export_bitmaps, find_xbmp_files, texture_png_basename
+from .entity_exporter import entity_geom_names, export_entities
 
-from .blender_utils import remove_mesh, set_clips, make_hull_box
+from .blender_utils import remove_mesh, set_clips, make_hull_box, fill_mesh
 
 from a51lib.info_reader import InfoReader
 
 from a51lib.dfs import Dfs
+from a51lib.dfs_pool import dfs_process_pool
+from a51lib.lru_cache import LRUCache
 from a51lib.playsurface import Playsurface
 from a51lib.rigid_geom import RigidGeom
-from a51lib.level_bin import LevelBin, LevelObject
-
-def dlist_to_verts_faces(dlist):
-    verts = []
-    faces = []
-    uvs = []
-    
-    for v in dlist.vertices:
-        pos = v.position
-        verts.append((pos[0], pos[1], pos[2]))
-    for i in range(0, len(dlist.indices), 3):
-        vidx1 = dlist.indices[i]
-        vidx2 = dlist.indices[i+1]
-        vidx3 = dlist.indices[i+2]
-        faces.append((vidx1, vidx2, vidx3))
-        
-        vertex = dlist.vertices[vidx1]
-        uvs.append(vertex.uv[0])
-        uvs.append(1.0 -vertex.uv[1])
-        vertex = dlist.vertices[vidx2]
-        uvs.append(vertex.uv[0])
-        uvs.append(1.0 - vertex.uv[1])
-        vertex = dlist.vertices[vidx3]
-        uvs.append(vertex.uv[0])
-        uvs.append(1.0 - vertex.uv[1])
-    return verts, faces, uvs
+from a51lib.rigid_geom_loader import load_rigid_geoms
+from a51lib.spatial_index import SpatialIndex
+from a51lib.geom_cache import GeomCache
+from a51lib.level_bin import LevelBin
+
+def dlist_to_mesh_arrays(dlist):
+    """ Convert a dlist to (co, loop_vertex_index, loop_start, uvs) arrays for fill_mesh. """
+    num_faces = len(dlist.indices) // 3
+    loop_vertex_index = dlist.indices[:num_faces * 3].astype(np.int32)
+    loop_start = np.arange(0, num_faces * 3, 3, dtype=np.int32)
+    # copy the positions, they are a view of the file data
+    co = np.array(dlist.positions, dtype=float)
+    uvs = dlist.uvs[loop_vertex_index].astype(np.float32)
+    uvs[:, 1] = 1.0 - uvs[:, 1]
+    return co, loop_vertex_index, loop_start, uvs
+
+def merge_mesh_arrays(parts):
+    """ Merge a list of (co, loop_vertex_index, loop_start, uvs) into one, offsetting the indices. """
+    vertex_offsets = np.cumsum([0] + [len(co) for co, _, _, _ in parts])
+    loop_offsets = np.cumsum([0] + [len(loops) for _, loops, _, _ in parts])
+    co = np.concatenate([part[0] for part in parts])
+    loop_vertex_index = np.concatenate([part[1] + vertex_offsets[i] for i, part in enumerate(parts)]).astype(np.int32)
+    loop_start = np.concatenate([part[2] + loop_offsets[i] for i, part in enumerate(parts)]).astype(np.int32)
+    uvs = np.concatenate([part[3] for part in parts])
+    return co, loop_vertex_index, loop_start, uvs
 
 def loadInfo(info_data):
-    lines = info_data.decode('utf-8').splitlines()
+    lines = bytes(info_data).decode('utf-8').splitlines()
     reader = InfoReader(lines)
     while header := reader.read_header():
         if header.type == 'PlayerInfo':
@@ -59,6 +61,9 @@ def loadInfo(info_data):
 class LevelExporter:
 
     rigid_geoms:  dict[str, RigidGeom]
+    geom_lru: LRUCache
+    texture_filenames: set[str]
+    unloaded_images: list[bpy.types.Image]
     materials: dict[str, bpy.types.Material]
     doom_materials: dict[str, str]
     meshes: dict[str, bpy.types.Mesh]
@@ -68,16 +73,52 @@ class LevelExporter:
     blend_dir: str
     verbose: bool
     bake_transforms: bool
+    batch_zones: bool
+    stream_zones: bool
+    zone_hulls: bool
+    workers: int
+    referenced_textures_only: bool
+    geom_cache: GeomCache | None
     a51_to_blender_mtx: Matrix4x4
 
-    def __init__(self, doom_root: str, bake_transforms: bool = True, verbose: bool = False):
+    def __init__(self, doom_root: str, bake_transforms: bool = True, verbose: bool = False, workers: int = 1,
+                 referenced_textures_only: bool = True, geom_cache_dir: str = None, batch_zones: bool = False,
+                 stream_zones: bool = False, max_geom_bytes: int = 256 * 1024 * 1024, zone_hulls: bool = False,
+                 region: tuple = None):
+        """ bake_transforms gives every placed surface its own mesh, transformed into Blender space.
+            Otherwise each geom submesh becomes one mesh in A51 space, shared by every placement and
+            positioned by the object's matrix_world, which keeps memory and .blend size down.
+            workers is the number of processes used for the slow parts of the export, such as textures.
+            referenced_textures_only limits the texture export to the textures used by the exported geoms,
+            rather than every bitmap in the resource DFS.
+            geom_cache_dir, if given, is where parsed geoms are cached between runs.
+            batch_zones merges the static geometry of each zone into one object per material,
+            instead of one object per surface submesh.
+            stream_zones loads each zone's geoms just before exporting the zone and lets them go afterwards,
+            keeping at most max_geom_bytes of recently used geoms for the following zones. Textures are
+            exported once every zone is done.
+            zone_hulls gives each zone its own hull box around its surfaces, rather than one box
+            around the whole level.
+            region, if given as (min xyz, max xyz) in A51 units, limits the static geometry to the surfaces
+            whose bounding boxes overlap it, found through the playsurface's spatial database.
+        """
+        self.geom_cache = GeomCache(geom_cache_dir) if geom_cache_dir else None
         self.verbose = verbose
+        self.workers = workers
+        self.referenced_textures_only = referenced_textures_only
         self.rigid_geoms = {}
+        self.geom_lru = LRUCache(max_geom_bytes, size_of=RigidGeom.data_size)
+        self.texture_filenames = set()
+        self.unloaded_images = []
         self.materials = {}
         self.doom_materials = {}
         self.meshes = {}
         self.doom_root = doom_root
         self.bake_transforms = bake_transforms
+        self.batch_zones = batch_zones
+        self.stream_zones = stream_zones
+        self.zone_hulls = zone_hulls
+        self.region = region
 
         self.tex_prefix = 'textures/'
         self.tex_dir = os.path.join(doom_root, 'textures')
@@ -91,53 +132,67 @@ class LevelExporter:
         self.a51_to_blender_mtx.scale(scale)
         self.a51_to_blender_mtx.convert_zup_to_yup()
 
-    def add_door(self, obj: LevelObject, door_collection, door_idx, dfs):
-        # Example Door properties:
-        #
-        # Base\Position = [-1700.0, 0.0, -3150.0]
-        # Base\Rotation = [0.0, 1.5707964897155762, 0.0]
-        # RenderInst\File = AH_HangarDoor_4x4m_000_bindpose.rigidgeom
-        # Door\Initial State = CLOSED
-        # Door\Resting State = CLOSED
-        geom_name = obj.properties['RenderInst\\File']
-        pos = obj.properties['Base\\Position']
-        rot = obj.properties['Base\\Rotation']
-        geom = self.find_rigid_geom(geom_name, dfs)
-        self.export_geom(geom, geom_name, None, pos, rot, door_collection, 'door'+str(door_idx))
-
-    def add_doors(self,level_bin: LevelBin, dfs):
-        door_collection = bpy.data.collections.new("Doors")
-        bpy.context.scene.collection.children.link(door_collection)
-        door_idx = 1
-        for obj in level_bin.objects:
-            if obj.type_name == 'Door':
-                self.add_door(obj, door_collection, door_idx, dfs)
-                door_idx += 1
-
-    def apply_transform_to_vertices(self, vertices):
-        for i in range(0, len(vertices)):
-           x, y, z = vertices[i]
-           vertices[i] = self.a51_to_blender_mtx.transform(x, y, z)
-
-    def apply_a51_transform_to_vertices(awlf, l2w, vertices):
-        # l2w is column major, numpy is row major so we need to transpose it
-        xform_mtx = np.array(l2w).reshape([4, 4]).T
-
-        for i in range(0, len(vertices)):
-           x, y, z = vertices[i]
-           x, y, z, _ = xform_mtx @ [x,y,z,1] 
-           vertices[i] = (x, y, z)
-
-    def export_geom(self, geom: RigidGeom, geom_name: str, l2w: list[float], pos, rot, col, name_prefix: str):
+    def blender_transform(self, l2w: list[float]) -> Matrix4x4:
+        """ The local to world transform followed by the A51 to Blender transform, as one matrix. """
+        if l2w is None:
+            return self.a51_to_blender_mtx
+        # l2w is column major
+        return self.a51_to_blender_mtx.multiply(Matrix4x4.from_column_major(l2w))
+
+    def submesh_texture(self, geom: RigidGeom, submesh):
+        texture_idx = geom.geom.materials[submesh.idx_material].texture_index
+        return geom.geom.textures[texture_idx]
+
+    def get_material(self, texture) -> bpy.types.Material:
+        """ The Blender material for a geom texture, created on first use. """
+        if texture.filename in self.materials:
+            material = self.materials[texture.filename]
+        else:
+            # https://docs.blender.org/api/current/bpy.types.Material.html#bpy.types.Material
+            tex_basename = texture_png_basename(texture.filename)
+            img_path = os.path.join(self.tex_dir, tex_basename+".png")
+            img_path = os.path.abspath(img_path)
+
+            try:
+                im = bpy.data.images.load(img_path, check_existing=True)
+                im.name = tex_basename+".png"
+            except RuntimeError:
+                im = bpy.data.images.new(tex_basename+".png", 128, 128)
+                # allow the path to be resolved later
+                im.filepath = img_path
+                im.source = 'FILE'
+                self.unloaded_images.append(im)
+
+            material = bpy.data.materials.new(self.tex_prefix+tex_basename)
+            material.use_nodes = True
+            teximage_node = material.node_tree.nodes.new("ShaderNodeTexImage")
+            teximage_node.image = im
+            bsdf_node = material.node_tree.nodes["Principled BSDF"]
+            material.node_tree.links.new(bsdf_node.inputs["Base Color"], teximage_node.outputs["Color"])
+
+            self.materials[texture.filename] = material
+            # Ignore alpha on everythign for now. TODO: Look at material flags to figure out the right thing to do.
+            self.doom_materials[self.tex_prefix+tex_basename] = "{ blend diffusemap\n map " + material.name + ".png\n alphaTest 0.0}"
+        return material
+
+    def export_geom(self, geom: RigidGeom, geom_name: str, l2w: list[float], pos, rot, col, name_prefix: str,
+                    bake: bool = None) -> list[bpy.types.Object]:
+        """ Make an object for each submesh of the geom, returning them.
+            bake overrides bake_transforms, e.g. to share meshes between many placements of a geom.
+        """
+        if bake is None:
+            bake = self.bake_transforms
+        objects = []
         mesh_no = 0
         for geom_mesh in geom.geom.meshes:
             for submesh_idx in range (geom_mesh.idx_sub_mesh, geom_mesh.idx_sub_mesh + geom_mesh.num_sub_meshes):
                 submesh = geom.geom.sub_meshes[submesh_idx]
                 obj_name = name_prefix + '_' + str(mesh_no) + '_' + str(submesh_idx)
-                if self.bake_transforms:
+                if bake:
                     # when baking transforms, each object has its own mesh
                     key = obj_name
                 else:
+                    # otherwise the untransformed mesh is shared by every instance
                     key = geom_name + '_' + geom_mesh.name + '_' + str(submesh_idx)
                 if key in self.meshes:
                     mesh = self.meshes[key]
@@ -145,96 +200,138 @@ class LevelExporter:
                     mesh = bpy.data.meshes.new(key)
                     
                     dlist = geom.dlists[submesh.idx_dlist]
-                    verts, faces, uvs = dlist_to_verts_faces(dlist)
-                    if self.bake_transforms:
-                        self.apply_a51_transform_to_vertices(l2w, verts)
-                        self.apply_transform_to_vertices(verts)
-                    mesh.from_pydata(verts, [], faces)
+                    co, loop_vertex_index, loop_start, uvs = dlist_to_mesh_arrays(dlist)
+                    if bake:
+                        co = self.blender_transform(l2w).transform_points(co)
+                    fill_mesh(mesh, co, loop_vertex_index, loop_start, uvs)
                     self.meshes[key] = mesh
-
-                    uv_data = mesh.uv_layers.new()
-                    uv_data.data.foreach_set('uv', uvs)
-                        
                 
                 obj = bpy.data.objects.new(obj_name, mesh)
                 obj["classname"] = "func_static"
                 obj["model"] = obj_name
                 obj["orig_mesh"] = geom_name + '_' + geom_mesh.name + '_' + str(submesh_idx)
             
-                texture_idx = geom.geom.materials[submesh.idx_material].texture_index
-                texture = geom.geom.textures[texture_idx]
-                if texture.filename in self.materials:
-                    material = self.materials[texture.filename]
-                else:
-                    # https://docs.blender.org/api/current/bpy.types.Material.html#bpy.types.Material
-                    tex_basename = texture.filename.split('.')[0].casefold().replace('[', '_').replace(']', '_').strip()
-                    img_path = os.path.join(self.tex_dir, tex_basename+".png")
-                    img_path = os.path.abspath(img_path)
-
-                    try:
-                        im = bpy.data.images.load(img_path, check_existing=True)
-                        im.name = tex_basename+".png"
-                    except RuntimeError:
-                        im = bpy.data.images.new(tex_basename+".png", 128, 128)
-                        # allow the path to be resolved later
-                        im.filepath = img_path
-                        im.source = 'FILE'
-
-                    material = bpy.data.materials.new(self.tex_prefix+tex_basename)
-                    material.use_nodes = True
-                    teximage_node = material.node_tree.nodes.new("ShaderNodeTexImage")
-                    teximage_node.image = im
-                    bsdf_node = material.node_tree.nodes["Principled BSDF"]
-                    material.node_tree.links.new(bsdf_node.inputs["Base Color"], teximage_node.outputs["Color"])
-
-                    self.materials[texture.filename] = material
-                    # Ignore alpha on everythign for now. TODO: Look at material flags to figure out the right thing to do.
-                    self.doom_materials[self.tex_prefix+tex_basename] = "{ blend diffusemap\n map " + material.name + ".png\n alphaTest 0.0}"
+                material = self.get_material(self.submesh_texture(geom, submesh))
                 # for now force the hull material
                 obj.active_material = material
                 # use this to test with no materials
                 #obj.active_material = self.materials['textures/base_wall/james']
                 
-                if not self.bake_transforms:
-                    if l2w:
-                        obj.matrix_world = [l2w[i:i+4] for i in range(0, 16, 4)]
+                if not bake:
+                    obj.matrix_world = self.blender_transform(l2w).m4.tolist()
                 if pos:
                     obj.location = (pos[0], pos[1], pos[2])
                 if rot:
                     obj.rotation_euler = (rot[0], rot[1], rot[2])
 
                 col.objects.link(obj)
+                objects.append(obj)
 
             mesh_no += 1
+        return objects
+
+    def add_rigid_geoms(self, geoms: dict[str, RigidGeom]):
+        """ Make loaded geoms available to the export and remember the textures they use. """
+        for geom_name, geom in geoms.items():
+            self.rigid_geoms[geom_name] = geom
+            for texture in geom.geom.textures:
+                self.texture_filenames.add(texture.filename)
+
+    def export_textures(self, resource_dfs: Dfs):
+        """ Export the textures. Call after loading the geoms which will be exported. """
+        xbmp_files = None
+        if self.referenced_textures_only:
+            # the textures of every geom loaded so far
+            xbmp_files = find_xbmp_files(resource_dfs, self.texture_filenames)
+        export_bitmaps(resource_dfs, self.tex_dir, self.workers, xbmp_files=xbmp_files)
+        # materials made before their png existed
+        for im in self.unloaded_images:
+            im.reload()
+        self.unloaded_images = []
 
     def export_surface(self, surface, name_prefix, col):
-        geom = self.rigid_geoms[surface.geom_name]
+        geom = self.rigid_geoms.get(surface.geom_name)
+        if geom is None:
+            # already reported when loading
+            return
         self.export_geom(geom, surface.geom_name, surface.l2w, None, None, col, name_prefix)
         
-    def export_surfaces(self, col, zone, zone_no):
-        surf_no = 0
-        for surface in zone.surfaces:
-            self.export_surface(surface, 'obj_z'+str(zone_no) + '_s'+str(surf_no), col)
-            surf_no += 1
-
-    def find_rigid_geom(self, geom_name: str, dfs: Dfs) -> RigidGeom:
-        if geom_name not in self.rigid_geoms:
-            geom_data = dfs.get_file(geom_name)
-            if geom_data == None:
-                print(f'Failed to find data for {geom_name}')
-                return None
-            geom = RigidGeom()
-            geom.read(geom_data)
-            if geom.is_valid():
-                self.rigid_geoms[geom_name] = geom
-            else:
-                print(f'Failed to read {geom_name}')
-        return self.rigid_geoms[geom_name]
+    def export_zone_batched(self, col, zone, zone_no, surf_nos: np.ndarray):
+        """ Export the baked geometry of the surfaces surf_nos of the zone as one object per material.
+            The faces keep where they came from in the a51_surface (surface number in the zone) and
+            a51_submesh (index in the geom's sub_meshes) attributes.
+        """
+        # texture filename -> (texture, mesh array parts, surface numbers, submesh indices)
+        batches = {}
+        # surfaces are made one at a time rather than through zone.surfaces, which would keep them all
+        for surf_no in surf_nos.tolist():
+            surface = zone.surface(surf_no)
+            geom = self.rigid_geoms.get(surface.geom_name)
+            if geom is None:
+                continue
+            transform = self.blender_transform(surface.l2w)
+            for geom_mesh in geom.geom.meshes:
+                for submesh_idx in range(geom_mesh.idx_sub_mesh, geom_mesh.idx_sub_mesh + geom_mesh.num_sub_meshes):
+                    submesh = geom.geom.sub_meshes[submesh_idx]
+                    co, loop_vertex_index, loop_start, uvs = dlist_to_mesh_arrays(geom.dlists[submesh.idx_dlist])
+                    co = transform.transform_points(co)
+                    texture = self.submesh_texture(geom, submesh)
+                    _, parts, surf_nos, submesh_idxs = batches.setdefault(texture.filename, (texture, [], [], []))
+                    parts.append((co, loop_vertex_index, loop_start, uvs))
+                    surf_nos.append(np.full(len(loop_start), surf_no, dtype=np.int32))
+                    submesh_idxs.append(np.full(len(loop_start), submesh_idx, dtype=np.int32))
+
+        for batch_no, (texture, parts, surf_nos, submesh_idxs) in enumerate(batches.values()):
+            obj_name = 'obj_z' + str(zone_no) + '_b' + str(batch_no)
+            mesh = bpy.data.meshes.new(obj_name)
+            fill_mesh(mesh, *merge_mesh_arrays(parts))
+            surface_attr = mesh.attributes.new('a51_surface', 'INT', 'FACE')
+            surface_attr.data.foreach_set('value', np.concatenate(surf_nos))
+            submesh_attr = mesh.attributes.new('a51_submesh', 'INT', 'FACE')
+            submesh_attr.data.foreach_set('value', np.concatenate(submesh_idxs))
+            self.meshes[obj_name] = mesh
+
+            obj = bpy.data.objects.new(obj_name, mesh)
+            obj["classname"] = "func_static"
+            obj["model"] = obj_name
+            obj.active_material = self.get_material(texture)
+            col.objects.link(obj)
+
+    def export_surfaces(self, col, zone, zone_no, surf_nos: np.ndarray = None):
+        """ Export the surfaces surf_nos of the zone, or all of them. Names keep the surface numbers in the zone. """
+        if surf_nos is None:
+            surf_nos = np.arange(len(zone))
+        if self.batch_zones:
+            self.export_zone_batched(col, zone, zone_no, surf_nos)
+            return
+        for surf_no in surf_nos.tolist():
+            self.export_surface(zone.surface(surf_no), 'obj_z'+str(zone_no) + '_s'+str(surf_no), col)
+
+    def collect_rigid_geoms(self, geom_names: list[str], dfs: Dfs, pool=None) -> None:
+        # parsing is done by worker processes when self.workers > 1, or by pool if given
+        self.rigid_geoms = {}
+        self.add_rigid_geoms(load_rigid_geoms(dfs, geom_names, self.workers, self.geom_cache, pool))
 
-    def collect_rigid_geoms(self, geom_names: list[str], dfs: Dfs) -> None:
+    def collect_zone_rigid_geoms(self, zone, dfs: Dfs, pool=None, surf_nos: np.ndarray = None) -> None:
+        """ Make self.rigid_geoms just the geoms used by the zone, or its surfaces surf_nos, reusing those
+            still in the LRU. pool is a dfs_process_pool shared by every zone, or None to parse in this process.
+        """
+        self.collect_lru_rigid_geoms(zone.geom_names(surf_nos), dfs, pool)
+
+    def collect_lru_rigid_geoms(self, geom_names: list[str], dfs: Dfs, pool=None) -> None:
+        """ Make self.rigid_geoms just the named geoms, taking those still in the LRU and loading the rest. """
         self.rigid_geoms = {}
+        to_load = []
         for geom_name in geom_names:
-            self.find_rigid_geom(geom_name, dfs)
+            geom = self.geom_lru.get(geom_name)
+            if geom is None:
+                to_load.append(geom_name)
+            else:
+                self.rigid_geoms[geom_name] = geom
+        loaded = load_rigid_geoms(dfs, to_load, 1, self.geom_cache, pool)
+        for geom_name, geom in loaded.items():
+            self.geom_lru.put(geom_name, geom)
+        self.add_rigid_geoms(loaded)
 
 
     def export_level(self, game_root: str, level_name: str):
@@ -242,11 +339,13 @@ class LevelExporter:
         bpy.ops.wm.read_factory_settings()
         self.meshes = {}
         self.materials = {}
+        self.texture_filenames = set()
+        self.unloaded_images = []
         remove_mesh("Cube")
 
         level_path = os.path.join(game_root, 'LEVELS', 'CAMPAIGN', level_name)
         level_dfs = Dfs()
-        level_dfs.open(os.path.join(level_path, 'LEVEL'))
+        level_dfs.open(os.path.join(level_path, 'LEVEL'), use_mmap=True)
         if self.verbose:
             print('\n\nLEVEL.DFS contents:\n')
             level_dfs.list_files()
@@ -280,14 +379,15 @@ class LevelExporter:
         worldspawn_col.objects.link(obj)
 
         resource_dfs = Dfs()
-        resource_dfs.open(os.path.join(level_path, 'RESOURCE'))
+        resource_dfs.open(os.path.join(level_path, 'RESOURCE'), use_mmap=True)
         if self.verbose:
             print('\n\nRESOURCE.DFS contents:\n')
             resource_dfs.list_files()
 
-        self.collect_rigid_geoms(playsurface.geoms, resource_dfs)
-        
-        export_bitmaps(resource_dfs, self.tex_dir)
+        entity_geoms = entity_geom_names(level_bin)
+        if not self.stream_zones:
+            self.collect_rigid_geoms(playsurface.geoms + entity_geoms, resource_dfs)
+            self.export_textures(resource_dfs)
 
         set_clips(1, 15000)
 
@@ -300,24 +400,45 @@ class LevelExporter:
         wall_material = bpy.data.materials.new('textures/base_wall/james')
         self.materials['textures/base_wall/james'] = wall_material
         
+        # one set of workers for every zone and then the entities, rather than starting them for each
+        zone_pool = dfs_process_pool(resource_dfs, self.workers) if self.stream_zones and self.workers > 1 else None
+
+        region_ids = SpatialIndex(playsurface).query_aabb_ids(*self.region) if self.region is not None else None
+
         zone_no = 0
-        hull_bbox = None
+        # (zone number, box) of each exported zone
+        zone_aabbs = []
         for zone in playsurface.zones:
+            surf_nos = np.arange(len(zone))
+            if region_ids is not None:
+                surf_nos = region_ids[region_ids[:, 0] == zone_no, 1]
+                if len(surf_nos) == 0:
+                    zone_no += 1
+                    continue
             # For each zone, export the models (surfaces) into the static geometry collection
             # Also create a hull based on the bounding box of the zone in the worldspawn collection
             col = bpy.data.collections.new("Zone "+str(zone_no))
             static_geom_collection.children.link(col)
-            self.export_surfaces(col, zone, zone_no)
-
-            for surface in zone.surfaces:
-                if hull_bbox is None:
-                    hull_bbox = surface.bounding_box
-                else:
-                    hull_bbox = hull_bbox.add(surface.bounding_box)
+            if self.stream_zones:
+                self.collect_zone_rigid_geoms(zone, resource_dfs, zone_pool, surf_nos)
+            self.export_surfaces(col, zone, zone_no, surf_nos)
+            if self.stream_zones:
+                # only the LRU keeps geoms alive between zones
+                self.rigid_geoms = {}
+
+            zone_aabbs.append((zone_no, aabb_union(aabbs_from_bboxes(zone.bboxes[surf_nos]))))
             zone_no += 1
-            if zone_no > 3:
-                # debugging check
-                break
+
+        if self.stream_zones:
+            # entity geoms which zones also used are still in the LRU
+            self.collect_lru_rigid_geoms(entity_geoms, resource_dfs, zone_pool)
+            self.geom_lru.clear()
+        if zone_pool is not None:
+            zone_pool.shutdown()
+        export_entities(self, level_bin, entities_col)
+        if self.stream_zones:
+            self.rigid_geoms = {}
+            self.export_textures(resource_dfs)
 
         # portal_no = 0
         # for zone in playsurface.portals:
@@ -326,12 +447,16 @@ class LevelExporter:
         #     export_surfaces(col, zone, materials, portal_no, tex_dir, tex_prefix)
         #     portal_no += 1
 
-        #add_doors(level_bin, resource_dfs, materials, tex_dir, tex_prefix)
-
-        hull_name = "worldspawn.Zone_" + str(zone_no) + "_Hull"
-
-        hull_bbox = hull_bbox.transform(self.a51_to_blender_mtx)
-        make_hull_box(worldspawn_col.name, hull_bbox.centre(), hull_bbox.size(), hull_name, hull_material)
+        if zone_aabbs:
+            hull_zone_nos = [hull_zone_no for hull_zone_no, _ in zone_aabbs]
+            aabbs = aabb_transform([aabb for _, aabb in zone_aabbs], self.a51_to_blender_mtx)
+            if self.zone_hulls:
+                hulls = [("worldspawn.Zone_" + str(hull_zone_no) + "_Hull", aabb) for hull_zone_no, aabb in zip(hull_zone_nos, aabbs)]
+            else:
+                hulls = [("worldspawn.Zone_" + str(zone_no) + "_Hull", aabb_union(aabbs))]
+            for hull_name, aabb in hulls:
+                hull_bbox = BoundingBox.from_aabb(aabb)
+                make_hull_box(worldspawn_col.name, hull_bbox.centre(), hull_bbox.size(), hull_name, hull_material)
 
         obj = bpy.data.objects.new("info_player_spawn_0", None)
         obj["classname"] = "info_player_start"
@@ -349,3 +474,6 @@ class LevelExporter:
 
         bpy.ops.wm.save_as_mainfile(
             filepath=self.blend_dir+'/'+level_name+'.blend', check_existing=False)
+
+        resource_dfs.close()
+        level_dfs.close()
@@ -1,29 +1,34 @@
 import os
 
-from blender.level_exporter import LevelExporter
-
 game_root = os.environ.get('A51_GAME_DATA', '/Users/ian/a51/pc/resources/app/game')
 doom_root = os.environ.get('A51_DOOM_DATA', '/Users/ian/doom/a51mod')
+# optional, where parsed geometry is cached between runs
+cache_root = os.environ.get('A51_CACHE_DIR')
+# optional, how many worker processes to use for textures and geometry
+workers = int(os.environ.get('A51_WORKERS', '1'))
 
 maps_path = os.path.join(doom_root, 'maps')
 textures_path = os.path.join(doom_root, 'textures')
 materials_path = os.path.join(doom_root, 'materials')
 
-os.makedirs(maps_path, exist_ok=True)
-os.makedirs(textures_path, exist_ok=True)
-os.makedirs(materials_path, exist_ok=True)
+# Worker processes import this module again, so only import Blender when run as the main module.
+if __name__ == '__main__':
+    from blender.level_exporter import LevelExporter
+
+    os.makedirs(maps_path, exist_ok=True)
+    os.makedirs(textures_path, exist_ok=True)
+    os.makedirs(materials_path, exist_ok=True)
 
-# write the hull material
-hull_material = """textures/a51/hull
+    # write the hull material
+    hull_material = """textures/a51/hull
 {
     {
         blend diffusemap
         map _black
     }
 }"""
-with open(os.path.join(materials_path, "hull.mtr"), "w") as myfile:
-    myfile.write(hull_material)
-
+    with open(os.path.join(materials_path, "hull.mtr"), "w") as myfile:
+        myfile.write(hull_material)
 
-LevelExporter(doom_root).export_level(game_root, 'DREAMLND')
-#export_level(game_root, 'CAVES', './export/levels')
+    LevelExporter(doom_root, workers=workers, geom_cache_dir=cache_root, stream_zones=True).export_level(game_root, 'DREAMLND')
+    #export_level(game_root, 'CAVES', './export/levels')